@@ -2,6 +2,7 @@
 # SPDX-FileCopyrightText: : 2017-2020 The PyPSA-Eur Authors
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
 import os
 from pathlib import Path
 
@@ -12,6 +13,32 @@ import pypsa
 from pypsa.descriptors import (Dict, get_active_assets)
 from pypsa.descriptors import get_switchable_as_dense as get_as_dense
 
+# Networks handed between stages in memory by ``scripts/run_pipeline.py``,
+# keyed by the absolute path of the file they stand for. Outside of the
+# runner networks are always read from and written to disk.
+NETWORK_STORE = None
+
+
+class NetworkStore(dict):
+    """
+    In-memory replacement for the network files ``paths`` of a pipeline run.
+    Only the files listed in ``write`` are also written to disk.
+    """
+
+    def __init__(self, paths, write=()):
+        super().__init__()
+        self.paths = {os.path.abspath(fn) for fn in paths}
+        self.write = {os.path.abspath(fn) for fn in write}
+
+
+def _stored_network(fn, copy=True):
+    if NETWORK_STORE is None or os.path.abspath(fn) not in NETWORK_STORE:
+        return None
+    if not copy:
+        return NETWORK_STORE[os.path.abspath(fn)]
+    # stages modify the network, keep the stored one for repeated runs
+    return NETWORK_STORE[os.path.abspath(fn)].copy()
+
 def sets_path_to_root(root_directory_name):
     """
     Search and sets path to the given root directory (root/path/file).
@@ -121,6 +148,10 @@ def load_network(import_name=None, custom_components=None):
     import pypsa
     from pypsa.descriptors import Dict
 
+    n = _stored_network(import_name) if import_name is not None else None
+    if n is not None:
+        return n
+
     override_components = None
     override_component_attrs = None
 
@@ -143,6 +174,296 @@ def load_network(import_name=None, custom_components=None):
         override_component_attrs=override_component_attrs,
     )
 
+def load_network_lazy(fn, periods=None, components=None, attrs=None):
+    """
+    Helper for importing a selection of a pypsa.Network from netCDF or Zarr.
+
+    The file is opened lazily with xarray and only the selected snapshots,
+    components and time-dependent attributes are read into memory. Paths
+    ending with ``.zarr`` are opened as Zarr stores.
+
+    Parameters
+    ----------
+    fn : str
+        Path to the netCDF file or Zarr store.
+    periods : list, optional
+        Investment periods whose snapshots are kept. The investment periods
+        and their weightings are kept in full, so that values derived from
+        them (e.g. ``n.investment_periods[0]``) match the full network. For
+        networks without investment periods these are the snapshots to keep.
+        All snapshots are kept by default.
+    components : list, optional
+        Components to import, e.g. ``["Generator", "Load"]``. Buses and
+        carriers are always imported. All components are imported by default.
+    attrs : list, optional
+        Time-dependent attributes to import, e.g. ``["p", "p_max_pu"]``. All
+        time-dependent attributes are imported by default, pass an empty list
+        to skip time-dependent data.
+
+    Returns
+    -------
+    pypsa.Network
+    """
+    import pypsa
+    import xarray as xr
+
+    n = _stored_network(fn)
+    if n is not None:
+        # already in memory, only the selection of periods applies
+        if periods is not None and isinstance(n.snapshots, pd.MultiIndex):
+            n.set_snapshots(n.snapshots[n.snapshots.get_level_values(0).isin(periods)])
+            gc = n.global_constraints
+            n.mremove(
+                "GlobalConstraint",
+                gc.index[gc.investment_period.notna() & ~gc.investment_period.isin(periods)],
+            )
+        return n
+
+    n = pypsa.Network()
+    if str(fn).endswith(".zarr"):
+        # arrays are read chunk by chunk when materialised
+        ds = xr.open_zarr(fn)
+    else:
+        ds = xr.open_dataset(fn)
+
+    if components is not None:
+        keep = {"Bus", "Carrier"}.union(components)
+        drop = [
+            n.components[c]["list_name"] + "_"
+            for c in n.all_components - keep
+        ]
+        ds = ds.drop_vars([v for v in ds.variables if v.startswith(tuple(drop))])
+
+    if attrs is not None:
+        series = [
+            v
+            for c in n.all_components
+            for v in ds.data_vars
+            if v.startswith(n.components[c]["list_name"] + "_t_")
+            and v[len(n.components[c]["list_name"] + "_t_"):] not in attrs
+        ]
+        ds = ds.drop_vars(series)
+
+    multi_invest = "snapshots_period" in ds
+    if periods is not None:
+        if multi_invest:
+            # the investment periods are kept in full, only the snapshots are selected
+            mask = ds["snapshots_period"].isin(periods).values
+        else:
+            mask = pd.DatetimeIndex(ds["snapshots_snapshot"].values).isin(pd.to_datetime(periods))
+        ds = ds.isel(snapshots=mask)
+
+    # Network.import_from_netcdf only accepts datasets it can derive a file name from
+    with pypsa.io.ImporterNetCDF(path=ds) as importer:
+        pypsa.io._import_from_importer(n, importer, basename="", skip_time=False)
+    ds.close()
+
+    if periods is not None and multi_invest and not n.global_constraints.empty:
+        gc = n.global_constraints
+        n.mremove(
+            "GlobalConstraint",
+            gc.index[gc.investment_period.notna() & ~gc.investment_period.isin(periods)],
+        )
+
+    return n
+
+
+def _network_dataset(n, profile):
+    """
+    Returns the dataset of the network as exported by pypsa, the snapshot chunk
+    size and the names of the input time series according to the export profile.
+    """
+    ds = n.export_to_netcdf()
+
+    if profile.get("drop_static", False):
+        for c in n.iterate_components():
+            for attr, df in c.pnl.items():
+                name = f"{c.list_name}_t_{attr}"
+                if name not in ds or attr not in c.df or df.empty:
+                    continue
+                static = c.df.loc[df.columns, attr]
+                cols = df.columns[(df == static).all()]
+                # pypsa already leaves out the columns equal to the default
+                exported = ds.indexes[name + "_i"]
+                cols = exported.intersection(cols)
+                if len(cols) == len(exported):
+                    ds = ds.drop_vars([name, name + "_i"])
+                elif len(cols):
+                    ds = ds.drop_sel({name + "_i": cols})
+
+    periods = n.snapshots.get_level_values(0) if isinstance(n.snapshots, pd.MultiIndex) else None
+    if profile.get("chunk_periods", True) and periods is not None:
+        snapshot_chunk = int(pd.Series(periods).value_counts().max())
+    else:
+        snapshot_chunk = len(n.snapshots)
+
+    inputs = set()
+    for c in n.iterate_components():
+        attrs = c.attrs[c.attrs.varying & c.attrs.status.str.startswith("Input")]
+        inputs.update(f"{c.list_name}_t_{attr}" for attr in attrs.index)
+
+    return ds, snapshot_chunk, inputs
+
+
+def _variable_encoding(ds, profile, snapshot_chunk, inputs, compression, chunks_key):
+    encoding = {}
+    for name, da in ds.data_vars.items():
+        # variable-length strings cannot be compressed
+        if da.dtype.kind not in "fiub":
+            continue
+        enc = dict(compression)
+        if "snapshots" in da.dims and da.ndim == 2 and snapshot_chunk:
+            enc[chunks_key] = (min(snapshot_chunk, da.shape[0]), max(da.shape[1], 1))
+        if profile.get("float32_inputs", False) and name in inputs and da.dtype.kind == "f":
+            enc["dtype"] = "float32"
+        encoding[name] = enc
+    return encoding
+
+
+def export_network(n, fn, profile=None):
+    """
+    Helper for exporting a pypsa.Network to netCDF with an export profile.
+
+    Paths ending with ``.zarr`` are written with :func:`export_network_zarr`.
+
+    Parameters
+    ----------
+    n : pypsa.Network
+    fn : str
+        Path to the netCDF file.
+    profile : dict, optional
+        Export profile, i.e. ``snakemake.config["export"]``:
+
+        .. code:: yaml
+
+            export:
+                compression: zlib # zlib, zstd or none
+                complevel: 4
+                chunk_periods: true # chunk time series by investment period
+                float32_inputs: true # store input time series in single precision
+                drop_static: true # drop time series columns equal to the static value
+
+        Without a profile the network is exported with pypsa defaults.
+    """
+    if NETWORK_STORE is not None and os.path.abspath(fn) in NETWORK_STORE.paths:
+        NETWORK_STORE[os.path.abspath(fn)] = n
+        if os.path.abspath(fn) not in NETWORK_STORE.write:
+            return
+
+    if str(fn).endswith(".zarr"):
+        export_network_zarr(n, fn, profile)
+        return
+
+    if not profile:
+        n.export_to_netcdf(fn)
+        return
+
+    ds, snapshot_chunk, inputs = _network_dataset(n, profile)
+
+    compression = profile.get("compression", "zlib")
+    if compression == "zlib":
+        compression = dict(zlib=True, complevel=profile.get("complevel", 4))
+    elif compression == "zstd":
+        compression = dict(compression="zstd", complevel=profile.get("complevel", 4))
+    else:
+        compression = {}
+
+    encoding = _variable_encoding(ds, profile, snapshot_chunk, inputs, compression, "chunksizes")
+    ds.to_netcdf(fn, encoding=encoding)
+
+
+def export_network_zarr(n, path, profile=None):
+    """
+    Helper for exporting a pypsa.Network to a Zarr store.
+
+    The store holds one array per component attribute, laid out as in the
+    netCDF export, so it can be read by :func:`load_network_lazy`. Time series
+    are chunked by investment period and can be read concurrently by several
+    processes. Results and further investment periods can be added later with
+    :func:`append_results_zarr` and :func:`append_period_zarr` without
+    rewriting the inputs.
+
+    Parameters
+    ----------
+    n : pypsa.Network
+    path : str
+        Path to the Zarr directory, which is replaced.
+    profile : dict, optional
+        Export profile as for :func:`export_network`.
+    """
+    import numcodecs
+
+    profile = profile or {}
+    ds, snapshot_chunk, inputs = _network_dataset(n, profile)
+
+    compression = profile.get("compression", "zlib")
+    complevel = profile.get("complevel", 4)
+    if compression == "zlib":
+        compression = dict(compressor=numcodecs.Zlib(level=complevel))
+    elif compression == "zstd":
+        compression = dict(compressor=numcodecs.Blosc(cname="zstd", clevel=complevel))
+    else:
+        compression = dict(compressor=None)
+
+    encoding = _variable_encoding(ds, profile, snapshot_chunk, inputs, compression, "chunks")
+    ds.to_zarr(path, mode="w", encoding=encoding, consolidated=True)
+
+
+def append_results_zarr(n, path):
+    """
+    Adds the optimisation results of a solved network to the Zarr store of
+    its inputs written with :func:`export_network_zarr`. Only output attributes
+    and network attributes such as the objective are written.
+    """
+    ds = n.export_to_netcdf()
+    outputs = []
+    for c in n.iterate_components():
+        attrs = c.attrs.index[c.attrs.status.str.startswith("Output")]
+        for attr in attrs:
+            for name in (f"{c.list_name}_{attr}", f"{c.list_name}_t_{attr}"):
+                if name in ds.data_vars:
+                    outputs.append(name)
+    ds = ds[outputs]
+    # the index coordinates are already stored with the inputs
+    ds = ds.drop_vars([v for v in ds.coords if v.endswith("_i") and "_t_" not in v])
+    ds.to_zarr(path, mode="a", consolidated=True)
+
+
+def append_period_zarr(n, path, period, profile=None):
+    """
+    Appends the snapshots of investment period ``period`` of ``n`` to a Zarr
+    store. The store must hold the same time-dependent columns as ``n`` after
+    applying the export ``profile`` the store was written with. Static data,
+    i.e. the components and global constraints, are kept as stored.
+    """
+    import xarray as xr
+
+    ds = _network_dataset(n, profile or {})[0]
+    stored = xr.open_zarr(path)
+
+    series = [v for v in ds.data_vars if "snapshots" in ds[v].dims]
+    for v in series:
+        dim = ds[v].dims[-1]
+        if v not in stored or (
+            ds[v].ndim == 2 and not ds.indexes[dim].equals(stored.indexes[dim])
+        ):
+            raise ValueError(f"Columns of {v} differ from those stored in {path}.")
+    n_stored = stored.sizes["snapshots"]
+    stored.close()
+
+    mask = (ds["snapshots_period"] == period).values
+    new = ds[series].isel(snapshots=mask)
+    new = new.drop_vars([v for v in new.coords if v != "snapshots"])
+    new = new.assign_coords(snapshots=np.arange(n_stored, n_stored + mask.sum()))
+    new.to_zarr(path, append_dim="snapshots", consolidated=True)
+
+    periods = [v for v in ds.data_vars if "investment_periods" in ds[v].dims]
+    if periods:
+        ds[periods].sel(investment_periods=[period]).to_zarr(
+            path, append_dim="investment_periods", consolidated=True
+        )
+
+
 def pdbcast(v, h):
     return pd.DataFrame(
         v.values.reshape((-1, 1)) * h.values, index=v.index, columns=h.index
@@ -388,6 +709,99 @@ def aggregate_costs(n, flatten=False, opts=None, existing_only=False):
 #     return costs
 
 
+def summarise_network(n, emission_prices=None, renewable_carriers=None):
+    """
+    Returns the key results of a solved network as a long table with the
+    columns ``quantity``, ``carrier``, ``period``, ``unit`` and ``value``.
+    Quantities which are not resolved by carrier or period leave these empty.
+
+    Curtailment is only reported for the variable renewables, the generators
+    of ``renewable_carriers`` or, if not given, those with a time-varying
+    ``p_max_pu``.
+    """
+    if isinstance(n.snapshots, pd.MultiIndex):
+        period = pd.Index(n.snapshots.get_level_values(0))
+    else:
+        period = pd.Index(n.snapshots.year)
+    periods = period.unique()
+    weightings = n.snapshot_weightings.generators
+
+    def per_period(df):
+        # snapshot-weighted sums per period (rows) of a time series frame
+        return df.mul(weightings, axis=0).groupby(period.values).sum()
+
+    def by_carrier(df, carrier):
+        # (carrier, period) series of a period x asset frame
+        return df.T.groupby(carrier).sum().stack()
+
+    def unresolved(values, carrier=np.nan, period=np.nan):
+        values = pd.Series(values)
+        carrier = values.index if carrier is None else [carrier] * len(values)
+        period = values.index if period is None else [period] * len(values)
+        return pd.Series(values.values, pd.MultiIndex.from_arrays([carrier, period]))
+
+    summary = {}
+    summary["objective", "currency"] = unresolved([n.objective])
+
+    capacity = {}
+    for c, attr in [("Generator", "p_nom_opt"), ("StorageUnit", "p_nom_opt"),
+                    ("Link", "p_nom_opt"), ("Store", "e_nom_opt")]:
+        df = n.df(c)
+        if df.empty:
+            continue
+        for p in periods:
+            active = get_active_assets(n, c, p) if isinstance(n.snapshots, pd.MultiIndex) else df.index
+            capacity[c, p] = df.loc[active, attr].groupby(df.carrier).sum()
+    if capacity:
+        capacity = pd.concat(capacity).groupby(level=[1, 2]).sum()
+        summary["capacity", "MW"] = capacity.swaplevel()
+
+    p = n.generators_t.p
+    summary["energy", "MWh"] = by_carrier(per_period(p), n.generators.carrier[p.columns])
+    if not n.storage_units_t.p.empty:
+        p_su = n.storage_units_t.p
+        summary["storage_dispatch", "MWh"] = by_carrier(
+            per_period(p_su), n.storage_units.carrier[p_su.columns]
+        )
+
+    co2 = n.generators.carrier.map(n.carriers.get("co2_emissions", pd.Series(dtype=float))).fillna(0.0)
+    emissions = per_period(p / n.generators.efficiency[p.columns] * co2[p.columns])
+    summary["emissions", "t"] = by_carrier(emissions, n.generators.carrier[p.columns])
+    if emission_prices is not None:
+        summary["emission_tax", "currency"] = summary["emissions", "t"] * emission_prices.get("co2", 0.0)
+
+    if renewable_carriers is None:
+        vres = p.columns.intersection(n.generators_t.p_max_pu.columns)
+    else:
+        vres = p.columns[n.generators.carrier[p.columns].isin(renewable_carriers)]
+    available = get_as_dense(n, "Generator", "p_max_pu")[vres] * n.generators.p_nom_opt[vres]
+    summary["curtailment", "MWh"] = by_carrier(per_period(available - p[vres]), n.generators.carrier[vres])
+
+    if not n.buses_t.marginal_price.empty and not n.loads.empty:
+        load = n.loads_t.p.T.groupby(n.loads.bus).sum().T
+        price = n.buses_t.marginal_price.reindex(columns=load.columns)
+        cost = per_period(load * price).sum(axis=1)
+        summary["load_weighted_price", "currency/MWh"] = unresolved(
+            cost / per_period(load).sum(axis=1), period=None
+        )
+
+    expansion = {}
+    for c, attr in [("Line", "s_nom"), ("Link", "p_nom")]:
+        df = n.df(c)
+        if df.empty:
+            continue
+        carrier = df.carrier.replace("", c)
+        expansion[c] = ((df[attr + "_opt"] - df[attr]) * df.length).groupby(carrier).sum()
+    if expansion:
+        expansion = pd.concat(expansion).droplevel(0)
+        summary["line_expansion", "MWkm"] = unresolved(expansion, carrier=None)
+
+    summary = pd.concat(summary, names=["quantity", "unit", "carrier", "period"])
+    summary = summary.rename("value").reset_index()
+    summary["period"] = pd.to_numeric(summary["period"]).astype("Int64")
+    return summary[["quantity", "carrier", "period", "unit", "value"]]
+
+
 def progress_retrieve(url, file, data=None, disable_progress=False, roundto=1.0):
     """
     Function to download data from a url with a progress bar progress in retrieving data
@@ -555,6 +969,45 @@ def read_geojson(fn):
         # else return an empty GeoDataFrame
         return gpd.GeoDataFrame(geometry=[])
 
+
+GEOMETRY_BBOX_COLUMNS = ["bbox_minx", "bbox_miny", "bbox_maxx", "bbox_maxy"]
+
+
+def load_geometries(fn, display=False, bbox=None):
+    """
+    Loads a layer of the geometry cache written by :mod:`build_geometry_cache`.
+
+    Parameters
+    ----------
+    fn : str
+        GeoParquet file ``resources/geometries/{source}/{layer}_{crs}.parquet``.
+    display : bool
+        Return the simplified geometries meant for plotting.
+    bbox : tuple, optional
+        ``(minx, miny, maxx, maxy)`` in the crs of the file, only geometries whose
+        bounding boxes intersect it are returned.
+    """
+    gdf = gpd.read_parquet(fn)
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        gdf = gdf[
+            (gdf.bbox_maxx >= minx) & (gdf.bbox_minx <= maxx)
+            & (gdf.bbox_maxy >= miny) & (gdf.bbox_miny <= maxy)
+        ]
+    if display:
+        gdf = gdf.set_geometry("geometry_display").drop(columns="geometry")
+        gdf = gdf.rename_geometry("geometry")
+    else:
+        gdf = gdf.drop(columns="geometry_display")
+    return gdf.drop(columns=GEOMETRY_BBOX_COLUMNS)
+
+
+def file_fingerprint(fn):
+    """Cheap fingerprint of a file from its path, size and modification time."""
+    stat = os.stat(fn)
+    key = f"{os.path.abspath(fn)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
 def pdbcast(v, h):
     return pd.DataFrame(v.values.reshape((-1, 1)) * h.values,
                         index=v.index, columns=h.index)
@@ -77,9 +77,11 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import powerplantmatching as pm
-import pypsa
 import xarray as xr
 from _helpers import (configure_logging,
+                    export_network,
+                    load_geometries,
+                    load_network,
                     update_p_nom_max,
                     pdbcast,
                     map_generator_parameters,
@@ -439,10 +441,7 @@ def attach_wind_and_solar(n, costs,input_profiles, model_setup, eskom_profiles):
 
     # Associate every generator with the bus of the region it is in or closest to
     pos = gpd.GeoSeries([Point(o.x, o.y) for o in gens[['x', 'y']].itertuples()], index=gens.index)
-    regions = gpd.read_file(
-        snakemake.input.supply_regions,
-        layer = snakemake.wildcards.regions
-    ).to_crs(snakemake.config["crs"]["geo_crs"]).set_index('name')
+    regions = load_geometries(snakemake.input.supply_regions).set_index('name')
 
     for bus, region in regions.geometry.items():
         pos_at_bus_b = pos.within(region)
@@ -461,11 +460,20 @@ def attach_wind_and_solar(n, costs,input_profiles, model_setup, eskom_profiles):
         if ((snakemake.config["enable"]["use_eskom_wind_solar"]==False) &
             (snakemake.config["enable"]["use_excel_wind_solar"][0]==False)):
             ds = xr.open_dataset(getattr(input_profiles, "profile_" + carrier))
-            for y in n.investment_periods:
-                    atlite_data = ds["profile"].transpose("time", "bus").to_pandas()
-                     #TODO remove hard coding only use 1yr from atlite at present
-                    #resource_carrier.loc[y] = (atlite_data.loc[str(weather_years[cnt])].clip(lower=0., upper=1.)).values
-                    resource_carrier.loc[y] = atlite_data.clip(lower=0., upper=1.).values[0:8760]
+            atlite_data = ds["profile"].transpose("time", "bus").to_pandas().clip(lower=0., upper=1.)
+            # reference weather years covered by the profile, applied sequentially to the simulation years
+            atlite_years = atlite_data.index.year.unique()
+            weather_years = snakemake.config['years']['reference_weather_years'][carrier]
+            missing = [wy for wy in weather_years if wy not in atlite_years]
+            if missing:
+                raise ValueError(
+                    f"Reference weather years {missing} of {carrier} are not covered by "
+                    f"the renewable profile, which holds {list(atlite_years)}."
+                )
+            for cnt, y in enumerate(n.investment_periods):
+                resource_carrier.loc[y] = (
+                    atlite_data.loc[str(weather_years[cnt % len(weather_years)])].values
+                )
         elif (snakemake.config["enable"]["use_excel_wind_solar"][0]):
             excel_wind_solar_profiles = generate_excel_wind_solar_profiles(n,
                                 snakemake.config['years']['reference_weather_years'])
@@ -536,10 +544,7 @@ def attach_existing_generators(n, costs, eskom_profiles, model_setup):
 
     # Associate every generator with the bus of the region it is in or closest to
     pos = gpd.GeoSeries([Point(o.x, o.y) for o in gens[['x', 'y']].itertuples()], index=gens.index)
-    regions = gpd.read_file(
-        snakemake.input.supply_regions,
-        layer = snakemake.wildcards.regions
-    ).to_crs(snakemake.config["crs"]["geo_crs"]).set_index('name')
+    regions = load_geometries(snakemake.input.supply_regions).set_index('name')
 
     for bus, region in regions.geometry.items():
         pos_at_bus_b = pos.within(region)
@@ -761,7 +766,7 @@ if __name__ == "__main__":
                             .loc[model_setup['projected_parameters']])
 
     #opts = snakemake.wildcards.opts.split('-')
-    n = pypsa.Network(snakemake.input.base_network)
+    n = load_network(snakemake.input.base_network)
     costs = load_costs(
         snakemake.input.model_file,
         model_setup.costs,
@@ -795,4 +800,4 @@ if __name__ == "__main__":
             snakemake.config['electricity']['min_stable_levels']
         )
     add_nice_carrier_names(n, snakemake.config)
-    n.export_to_netcdf(snakemake.output[0])
\ No newline at end of file
+    export_network(n, snakemake.output[0], snakemake.config.get("export"))
\ No newline at end of file
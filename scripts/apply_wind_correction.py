@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# SPDX-FileCopyrightText: : 2017-2022 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+The ERA5 grid spacing of ~30km results in predictions of annual average capacity factors in wind locations
+in South Africa that are underestimated. This function takes the predicted hourly wind speed at 100m from
+the cutout and scales it so that the average annual matches the high resolution data from the Wind Atlas https://globalwindatlas.info/en.
+
+Within each cell the 75% quantile of the Wind Atlas data is used to scale the ERA5 wind speed.
+
+Relevant Settings
+-----------------
+
+.. code:: yaml
+
+    atlite:
+        apply_wind_correction:
+        wind_correction_method: quantile
+
+Inputs
+------
+
+- ``cutouts/{cutout}.nc``: confer :ref:`cutout`
+- ``data/bundle/ZAF_wind-speed_100m.tif``: Global Wind Atlas mean wind speed at 100m
+- ``data/bundle/ZAF_terrain-ruggedness-index.tif``: Terrain ruggedness index, Wind Atlas pixels
+  in unusable terrain (index above 200) are ignored
+
+Outputs
+-------
+
+- ``resources/wind_correction_{cutout}.nc``: Scaling factor on the ``(y, x)`` grid of the cutout,
+  which :mod:`build_renewable_profiles` applies lazily to ``wnd100m`` as one broadcast multiplication.
+
+Description
+-----------
+
+Each Wind Atlas pixel is assigned to the cutout cell containing it through an index raster,
+the quantiles of all cells are then taken in one grouped reduction instead of masking the
+Wind Atlas for every cell.
+"""
+
+import logging
+
+import atlite
+import numpy as np
+import pandas as pd
+import rioxarray
+import xarray as xr
+from _helpers import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def cell_index(cutout, x, y):
+    """
+    Returns the position of the cutout cell containing each of the points
+    spanned by ``x`` and ``y`` as a raster, -1 outside of the cutout.
+    """
+    ix = np.round((x - cutout.data.x.values[0]) / cutout.dx).astype(int)
+    iy = np.round((y - cutout.data.y.values[0]) / cutout.dy).astype(int)
+    nx, ny = len(cutout.data.x), len(cutout.data.y)
+    inside = (ix >= 0) & (ix < nx)
+    index = np.where(inside[np.newaxis, :], iy[:, np.newaxis] * nx + ix[np.newaxis, :], -1)
+    return np.where(((iy >= 0) & (iy < ny))[:, np.newaxis], index, -1)
+
+
+def quantile_wind_correction(cutout, gwa_map, terrain_ruggedness_index, q=0.75):
+    """
+    Returns the ratio of the ``q`` quantile of the Global Wind Atlas within
+    each cell of ``cutout`` to the mean ERA5 wind speed at 100m of the cell.
+    Cells without usable atlas data keep a factor of 1.
+    """
+    x, X, y, Y = cutout.extent
+    gwa_data = rioxarray.open_rasterio(gwa_map).sel(band=1)
+    gwa_data = gwa_data.rio.clip_box(
+        x - cutout.dx / 2, y - cutout.dy / 2, X + cutout.dx / 2, Y + cutout.dy / 2
+    )
+    gwa_data = gwa_data.where(gwa_data != -999)
+
+    # Remove GWA data associated with unusable terrain
+    terrain_roughness = rioxarray.open_rasterio(terrain_ruggedness_index).sel(band=1)
+    terrain_roughness = terrain_roughness.interp(
+        x=gwa_data.x, y=gwa_data.y, method="linear"
+    )
+    gwa_data = gwa_data.where((terrain_roughness > 0) & (terrain_roughness <= 200))
+
+    index = cell_index(cutout, gwa_data.x.values, gwa_data.y.values).ravel()
+    values = gwa_data.values.ravel()
+    valid = (index >= 0) & ~np.isnan(values)
+    quantiles = pd.Series(values[valid]).groupby(index[valid]).quantile(q)
+
+    shape = len(cutout.data.y), len(cutout.data.x)
+    cell_quantile = np.full(shape[0] * shape[1], np.nan)
+    cell_quantile[quantiles.index] = quantiles.values
+    cell_quantile = xr.DataArray(
+        cell_quantile.reshape(shape),
+        coords={"y": cutout.data.y, "x": cutout.data.x},
+        dims=("y", "x"),
+    )
+
+    era5_mean = cutout.data.wnd100m.mean("time").compute()
+    correction = (cell_quantile / era5_mean).where(era5_mean != 0)
+    return correction.fillna(1)
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake("apply_wind_correction", cutout="RSA-2012-era5")
+    configure_logging(snakemake)
+
+    cutout = atlite.Cutout(snakemake.input.cutout)
+
+    logger.info(
+        f"Scaling annual wind speed at 100m to match {snakemake.input.wasa_map} "
+        "at each cell in the cutout."
+    )
+    correction = quantile_wind_correction(
+        cutout, snakemake.input.wasa_map, snakemake.input.terrain_ruggedness_index
+    )
+    correction.rename("wind_correction").to_netcdf(snakemake.output[0])
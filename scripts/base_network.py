@@ -68,6 +68,7 @@ import geopandas as gpd
 import pandas as pd
 import numpy as np
 import pypsa
+from _helpers import export_network
 
 def create_network():
     n = pypsa.Network()
@@ -164,5 +165,5 @@ if __name__ == "__main__":
         lines.drop('geometry',axis=1,inplace=True)
     add_components_to_network(n, buses, lines, line_config)
     
-    n.export_to_netcdf(snakemake.output[0])
+    export_network(n, snakemake.output[0], snakemake.config.get("export"))
 
@@ -18,6 +18,7 @@ Relevant Settings
         nprocesses:
         cutouts:
             {cutout}:
+                era5_dir:
 .. seealso::
     Documentation of the configuration file ``config.yaml`` at
     :ref:`atlite_cf`
@@ -74,23 +75,165 @@ A **SARAH-2 cutout** can be used to amend the fields ``temperature``, ``influx_t
 Description
 -----------
 This code has been modified for PyPSA-ZA to build a cutout for South Africa based on the shapefile specified 
+
+If ``era5_dir`` is set for a cutout, it is assembled offline from monthly ERA5 single level files
+``{era5_dir}/{year}-{month}.nc`` (e.g. ``2012-01.nc``) as downloaded from the Climate Data Store,
+holding the variables ``u100``, ``v100``, ``fsr``, ``ssrd``, ``ssr``, ``fdir``, ``tisr``, ``t2m``,
+``stl4``, ``ro`` and ``z`` of the configured ``features``. The months are streamed one at a time
+into compressed, time-chunked part files next to the cutout, an interrupted run resumes at the
+first missing month. SARAH data is always read from the local ``sarah_dir`` by atlite.
 """
 
 import logging
+import os
+import shutil
+from pathlib import Path
 
 import atlite
-import geopandas as gpd
 import pandas as pd
 import numpy as np
 import xarray as xr
 import rasterio
 import shapely
+from atlite.pv.solar_position import SolarPosition
 
-from _helpers import configure_logging
+from _helpers import configure_logging, load_geometries
 
 
 logger = logging.getLogger(__name__)
 
+# atlite features of the ERA5 module and the variables they consist of
+ERA5_FEATURES = {
+    "height": ["height"],
+    "wind": ["wnd100m", "roughness"],
+    "influx": [
+        "influx_toa",
+        "influx_direct",
+        "influx_diffuse",
+        "albedo",
+        "solar_altitude",
+        "solar_azimuth",
+    ],
+    "temperature": ["temperature", "soil temperature"],
+    "runoff": ["runoff"],
+}
+
+CUTOUT_CHUNKS = {"time": 100}
+
+
+def era5_features(ds, features):
+    """
+    Derives the atlite ERA5 ``features`` from the ERA5 single level variables
+    in ``ds`` (CDS short names), following the conversions of
+    ``atlite.datasets.era5``.
+    """
+    out = xr.Dataset(coords={c: ds.coords[c] for c in ("x", "y", "time")})
+    out = out.assign_coords(lon=out.coords["x"], lat=out.coords["y"])
+    if "height" in features:
+        out["height"] = (ds["z"].isel(time=0, drop=True) / 9.80665).assign_attrs(
+            units="m", long_name="Surface height"
+        )
+    if "wind" in features:
+        out["wnd100m"] = np.sqrt(ds["u100"] ** 2 + ds["v100"] ** 2).assign_attrs(
+            units=ds["u100"].attrs.get("units", "m s**-1"), long_name="100 metre wind speed"
+        )
+        out["roughness"] = ds["fsr"]
+    if "influx" in features:
+        out["influx_direct"] = ds["fdir"]
+        out["influx_toa"] = ds["tisr"]
+        out["albedo"] = (
+            ((ds["ssrd"] - ds["ssr"]) / ds["ssrd"].where(ds["ssrd"] != 0))
+            .fillna(0.0)
+            .assign_attrs(units="(0 - 1)", long_name="Albedo")
+        )
+        out["influx_diffuse"] = ds["ssrd"] - ds["fdir"]
+        # convert from energy to power J m**-2 -> W m**-2
+        for a in ("influx_direct", "influx_diffuse", "influx_toa"):
+            out[a] = (out[a] / (60.0 * 60.0)).assign_attrs(units="W m**-2")
+        # ERA5 values are means of the previous hour, take the sun at its centre
+        sp = SolarPosition(out, time_shift=pd.to_timedelta("-30 minutes"))
+        out = xr.merge([out, sp.rename({v: f"solar_{v}" for v in sp.data_vars})])
+    if "temperature" in features:
+        out["temperature"] = ds["t2m"]
+        out["soil temperature"] = ds["stl4"]
+    if "runoff" in features:
+        out["runoff"] = ds["ro"]
+
+    for feature in features:
+        for v in ERA5_FEATURES[feature]:
+            out[v].attrs.update(module="era5", feature=feature)
+    return out
+
+
+def cutout_encoding(ds):
+    return {
+        v: dict(
+            zlib=True,
+            complevel=4,
+            chunksizes=tuple(
+                min(CUTOUT_CHUNKS.get(d, ds.sizes[d]), ds.sizes[d]) for d in ds[v].dims
+            ),
+        )
+        for v in ds.data_vars
+    }
+
+
+def assemble_era5_cutout(fn, era5_dir, x, y, dx, dy, time, features=None):
+    """
+    Assembles the cutout ``fn`` from local monthly ERA5 files
+    ``{era5_dir}/{year}-{month}.nc`` without network access.
+
+    Every month is read lazily, cropped and interpolated to the cutout grid,
+    converted to the atlite features and written to its own part file next to
+    ``fn``. Parts are written to a temporary file first and renamed once
+    complete, so an interrupted run resumes at the first missing month. The
+    parts are finally combined chunk by chunk, so at most one month of the
+    weather data is in memory at a time.
+    """
+    features = list(ERA5_FEATURES) if features is None else np.atleast_1d(features).tolist()
+    xs = np.round(np.arange(x.start, x.stop + dx / 2, dx), 8)
+    ys = np.round(np.arange(y.start, y.stop + dy / 2, dy), 8)
+    start = pd.Timestamp(time.start)
+    end = pd.Period(time.stop).end_time if isinstance(time.stop, str) else pd.Timestamp(time.stop)
+
+    parts_dir = Path(f"{fn}.parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    parts = []
+    for month in pd.period_range(start, end, freq="M"):
+        part = parts_dir / f"{month.year}-{month.month:02d}.nc"
+        parts.append(part)
+        if part.exists():
+            logger.info(f"Skipping {month}, already assembled")
+            continue
+
+        source = Path(era5_dir) / f"{month.year}-{month.month:02d}.nc"
+        logger.info(f"Assembling {month} from {source}")
+        with xr.open_dataset(source, chunks=CUTOUT_CHUNKS) as ds:
+            ds = ds.rename({"longitude": "x", "latitude": "y"}).sortby("y")
+            ds = ds.sel(time=slice(start, end))
+            ds = ds.sel(x=slice(xs[0] - 1, xs[-1] + 1), y=slice(ys[0] - 1, ys[-1] + 1))
+            ds = ds.interp(x=xs, y=ys)
+            ds = era5_features(ds, features)
+            tmp = part.with_suffix(".tmp")
+            ds.to_netcdf(tmp, encoding=cutout_encoding(ds))
+        os.replace(tmp, part)
+
+    # variables without time (height) are taken from the first month
+    with xr.open_mfdataset(
+        parts,
+        combine="nested",
+        concat_dim="time",
+        data_vars="minimal",
+        coords="minimal",
+        compat="override",
+        chunks=CUTOUT_CHUNKS,
+    ) as ds:
+        ds.attrs.update(module="era5")
+        tmp = f"{fn}.tmp"
+        ds.to_netcdf(tmp, encoding=cutout_encoding(ds))
+    os.replace(tmp, fn)
+    shutil.rmtree(parts_dir)
+
 if __name__ == "__main__":
     if "snakemake" not in globals():
         from _helpers import mock_snakemake
@@ -107,7 +250,7 @@ if __name__ == "__main__":
 
     if {"x", "y", "bounds"}.isdisjoint(cutout_params):
         # Determine the bounds from bus regions with a buffer of two grid cells
-        onshore = gpd.read_file(snakemake.input.regions_onshore, layer="1-supply")
+        onshore = load_geometries(snakemake.input.regions_onshore)
         regions = pd.concat([onshore])
         d = max(cutout_params.get("dx", 0.25), cutout_params.get("dy", 0.25)) * 2
         cutout_params["bounds"] = regions.total_bounds + [-d, -d, d, d]
@@ -117,8 +260,25 @@ if __name__ == "__main__":
 
     logging.info(f"Preparing cutout with parameters {cutout_params}.")
     features = cutout_params.pop("features", None)
-    
-    cutout = atlite.Cutout(snakemake.output[0], **cutout_params)
-    cutout.prepare(features=features)
+    era5_dir = cutout_params.pop("era5_dir", None)
+
+    if era5_dir:
+        if "bounds" in cutout_params:
+            x0, y0, x1, y1 = cutout_params.pop("bounds")
+            cutout_params.update(x=slice(x0, x1), y=slice(y0, y1))
+        # offline, from the monthly ERA5 files in era5_dir
+        assemble_era5_cutout(
+            snakemake.output[0],
+            era5_dir,
+            x=cutout_params["x"],
+            y=cutout_params["y"],
+            dx=cutout_params.get("dx", 0.25),
+            dy=cutout_params.get("dy", 0.25),
+            time=cutout_params["time"],
+            features=features,
+        )
+    else:
+        cutout = atlite.Cutout(snakemake.output[0], **cutout_params)
+        cutout.prepare(features=features)
 
     
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Combines all land exclusions of a technology into a single eligibility raster
+over the cutout extent, so that :mod:`build_renewable_profiles` reads one
+aligned layer instead of reprojecting and buffering the individual layers again
+for every run.
+
+Relevant Settings
+-----------------
+
+.. code:: yaml
+
+    enable:
+        build_eligibility_raster:
+
+    renewable:
+        {technology}:
+            cutout:
+            natura:
+            salandcover:
+                grid_codes:
+                distance:
+                distance_grid_codes:
+            excluder_resolution:
+
+.. seealso::
+    Documentation of the configuration file ``config.yaml`` at
+    :ref:`toplevel_cf`, :ref:`renewable_cf`
+
+Inputs
+------
+
+- ``data/bundle/{resarea}``: resource areas the technology is limited to
+- ``resources/landuse_without_protected_conservation.tiff``: (if ``natura``) confer :mod:`build_natura_raster`
+- ``data/bundle/SALandCover_OriginalUTM35North_2013_GTI_72Classes/...tif``: South African land cover
+- ``"cutouts/" + config["renewable"][{technology}]['cutout']``: :ref:`cutout`
+
+Outputs
+-------
+
+- ``resources/eligibility_{technology}_{resarea}_{confighash}.tif``: Tiled, compressed
+  ``uint8`` raster in EPSG:3035 at ``excluder_resolution``, 1 for eligible and 0 for
+  excluded land. ``confighash`` is derived from the exclusion settings of the
+  technology, so changing them produces a new raster instead of a stale one.
+
+Description
+-----------
+
+The raster is computed window by window with :func:`atlite.gis.shape_availability`,
+which keeps the memory footprint bounded by ``tile`` pixels squared.
+"""
+
+import logging
+
+import atlite
+import geopandas as gpd
+import numpy as np
+import rasterio as rio
+from _helpers import configure_logging
+from build_natura_raster import CUTOUT_CRS, determine_cutout_xXyY, get_transform_and_shape
+from build_renewable_profiles import build_excluder
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from shapely.geometry import box
+
+logger = logging.getLogger(__name__)
+
+
+def write_eligibility(excluder, bounds, fn, tile=2048):
+    """
+    Writes the eligibility of the area within ``bounds`` (in the crs of the
+    ``excluder``) to ``fn`` in windows of ``tile`` x ``tile`` pixels.
+    """
+    res = excluder.res
+    transform, shape = get_transform_and_shape(bounds, res)
+    excluder.open_files()
+
+    with rio.open(
+        fn,
+        "w",
+        driver="GTiff",
+        dtype=rio.uint8,
+        count=1,
+        transform=transform,
+        crs=excluder.crs,
+        width=shape[1],
+        height=shape[0],
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+        compress="deflate",
+    ) as dst:
+        for row in range(0, shape[0], tile):
+            for col in range(0, shape[1], tile):
+                window = Window(
+                    col, row, min(tile, shape[1] - col), min(tile, shape[0] - row)
+                )
+                geometry = gpd.GeoSeries(
+                    [box(*window_bounds(window, transform))], crs=excluder.crs
+                )
+                masked, masked_transform = atlite.gis.shape_availability(
+                    geometry, excluder
+                )
+
+                # position of the window within the (padded) grid of the result
+                i = int(round((masked_transform.f - (transform.f - row * res)) / res))
+                j = int(round((transform.c + col * res - masked_transform.c) / res))
+                data = np.zeros((window.height, window.width), dtype=rio.uint8)
+                block = masked[max(i, 0) : i + window.height, max(j, 0) : j + window.width]
+                data[
+                    max(-i, 0) : max(-i, 0) + block.shape[0],
+                    max(-j, 0) : max(-j, 0) + block.shape[1],
+                ] = block
+                dst.write(data, indexes=1, window=window)
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake(
+            "build_eligibility_raster", technology="onwind", resarea="redz", confighash="0"
+        )
+    configure_logging(snakemake)
+
+    config = snakemake.config["renewable"][snakemake.wildcards.technology]
+    area_crs = snakemake.config["crs"]["area_crs"]
+
+    excluder = build_excluder(config, snakemake.input, area_crs)
+
+    x, X, y, Y = determine_cutout_xXyY(snakemake.input.cutout)
+    bounds = transform_bounds(CUTOUT_CRS, excluder.crs, x, y, X, Y)
+
+    logger.info(
+        f"Rasterising eligible land for {snakemake.wildcards.technology} "
+        f"at {excluder.res} m resolution"
+    )
+    write_eligibility(excluder, bounds, snakemake.output[0])
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Writes a layer of the supply regions or of the resource areas once per
+coordinate reference system to GeoParquet, so that scripts load it with
+:func:`_helpers.load_geometries` instead of reading and reprojecting the
+original files every time.
+
+Relevant Settings
+-----------------
+
+.. code:: yaml
+
+    crs:
+        geo_crs:
+        distance_crs:
+        area_crs:
+
+    geometry_cache:
+        simplify_tolerance:
+
+    data:
+        resarea:
+
+.. seealso::
+    Documentation of the configuration file ``config.yaml`` at
+    :ref:`toplevel_cf`
+
+Inputs
+------
+
+- ``data/bundle/rsa_supply_regions.gpkg``: (for ``source`` ``supply_regions``) supply regions, one layer per ``{regions}``
+- ``data/bundle/{resarea}``: (for ``source`` ``resarea``) resource areas, confer ``data: resarea:``
+
+Outputs
+-------
+
+- ``resources/geometries/{source}/{layer}_{crs}.parquet``: The layer in ``crs`` (one of ``geo``,
+  ``distance`` or ``area``) with the bounding box of each geometry in the columns
+  ``bbox_minx``, ``bbox_miny``, ``bbox_maxx``, ``bbox_maxy`` for spatial filtering and a
+  simplified copy of the geometries in ``geometry_display`` for plotting.
+"""
+
+import logging
+
+import geopandas as gpd
+from _helpers import GEOMETRY_BBOX_COLUMNS, configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake(
+            "build_geometry_cache", source="supply_regions", layer="27-supply", crs="geo"
+        )
+    configure_logging(snakemake)
+
+    source, layer, crs = (
+        snakemake.wildcards.source, snakemake.wildcards.layer, snakemake.wildcards.crs
+    )
+    if source == "supply_regions":
+        gdf = gpd.read_file(snakemake.input[0], layer=layer)
+    else:
+        gdf = gpd.read_file(snakemake.input[0])
+    gdf = gdf.to_crs(snakemake.config["crs"][f"{crs}_crs"])
+
+    bounds = gdf.bounds
+    bounds.columns = GEOMETRY_BBOX_COLUMNS
+    gdf = gdf.join(bounds)
+
+    tolerance = snakemake.config.get("geometry_cache", {}).get("simplify_tolerance", {}).get(crs)
+    if tolerance:
+        gdf["geometry_display"] = gdf.geometry.simplify(tolerance, preserve_topology=True)
+    else:
+        gdf["geometry_display"] = gdf.geometry
+
+    logger.info(f"Caching {len(gdf)} geometries of {source} {layer} in the {crs} crs")
+    gdf.to_parquet(snakemake.output[0])
@@ -28,17 +28,27 @@ Outputs
         :scale: 33 %
 Description
 -----------
+The raster is written in windows of 4096 x 4096 cells. The protected areas
+intersecting each window are looked up in the spatial index of all areas and
+rasterised in a pool of ``threads`` processes, so peak memory is bounded by the
+window size and the areas are never unified into a single shape.
 """
 
 import logging
 import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 import atlite
 import geopandas as gpd
+import numpy as np
 import rasterio as rio
 from _helpers import configure_logging
 from rasterio.features import geometry_mask
 from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
+from shapely.geometry import box
 
 logger = logging.getLogger(__name__)
 
@@ -79,54 +89,98 @@ def get_transform_and_shape(bounds, res):
     transform = rio.Affine(res, 0, left, 0, -res, top)
     return transform, shape
 
-def unify_protected_shape_areas(inputs, geo_crs):
+def load_protected_shape_areas(inputs, geo_crs):
     """
-    Iterates thorugh all snakemake rule inputs and unifies shapefiles (.shp) only.
+    Iterates thorugh all snakemake rule inputs and reads shapefiles (.shp) only.
     The input is given in the Snakefile and shapefiles are given by .shp
     Returns
     -------
-    unified_shape : GeoDataFrame with a unified "multishape"
+    shapes : GeoSeries with the valid geometries of all shapefiles, without
+    unifying them into a single shape
     """
     import pandas as pd
-    from shapely.ops import unary_union
     from shapely.validation import make_valid
 
     # Read only .shp snakemake inputs
     shp_files = [string for string in inputs if ".shp" in string]
     assert len(shp_files) != 0, "no input shapefiles given"
-    # Create one geodataframe with all geometries, of all .shp files
-    total_files = 0
-    read_files = 0
     list_shapes = []
     for i in shp_files:
-        shp = gpd.read_file(i).to_crs(geo_crs)
-        total_files +=1
         try:
-            shp.geometry = shp.apply(
-                lambda row: make_valid(row.geometry)
-                if not row.geometry.is_valid
-                else row.geometry,
-                axis = 1,
-            )
-            list_shapes.append(shp)
-            read_files += 1
-        except:
-            print(f'Error reading file{i}')
-    shape = gpd.GeoDataFrame(pd.concat(list_shapes)).to_crs(geo_crs)
+            shp = gpd.read_file(i).to_crs(geo_crs).geometry
+        except Exception:
+            logger.warning(f"Error reading file {i}")
+            continue
+        # repair only the invalid geometries
+        invalid = ~shp.is_valid
+        shp[invalid] = shp[invalid].apply(make_valid)
+        list_shapes.append(shp)
+    shapes = gpd.GeoSeries(pd.concat(list_shapes, ignore_index=True), crs=geo_crs)
 
-    # Removes shapely geometry with null values. Returns geoseries.
-    shape = shape["geometry"][shape["geometry"].is_valid]
+    # Removes shapely geometry with null values.
+    return shapes[shapes.notnull() & ~shapes.is_empty & shapes.is_valid].reset_index(drop=True)
 
-    # Create Geodataframe with crs
-    shape = gpd.GeoDataFrame(shape, crs=geo_crs)
-    shape = shape.rename(columns={0: "geometry"}).set_geometry("geometry")
 
-    # Unary_union makes out of i.e. 1000 shapes -> 1 unified shape
-    unified_shape_file = unary_union(shape["geometry"])
+def raster_windows(shape, tile):
+    for row in range(0, shape[0], tile):
+        for col in range(0, shape[1], tile):
+            yield Window(col, row, min(tile, shape[1] - col), min(tile, shape[0] - row))
 
-    unified_shape = gpd.GeoDataFrame(geometry=[unified_shape_file], crs=geo_crs)
 
-    return unified_shape
+def _rasterize_window(task):
+    window, transform, geometries = task
+    out_shape = (window.height, window.width)
+    if not geometries:
+        return window, np.zeros(out_shape, dtype=rio.uint8)
+    raster = ~geometry_mask(geometries, out_shape, window_transform(window, transform))
+    return window, raster.astype(rio.uint8)
+
+
+def rasterize_tiled(shapes, transform, out_shape, fn, nprocesses=1, tile=4096):
+    """
+    Rasterises ``shapes`` onto the grid given by ``transform`` and ``out_shape``
+    window by window. The geometries are bucketed into the windows through the
+    spatial index of ``shapes``, the windows are rasterised in a process pool
+    and written to ``fn`` as they complete, so that neither a union of all
+    shapes nor the full raster is ever held in memory. At most two windows per
+    process are queued at a time, which bounds the geometries held in flight.
+    """
+    sindex = shapes.sindex
+
+    def tasks():
+        for window in raster_windows(out_shape, tile):
+            bounds = box(*window_bounds(window, transform))
+            geometries = list(shapes.iloc[sindex.query(bounds, predicate="intersects")])
+            yield window, transform, geometries
+
+    with rio.open(
+        fn,
+        "w",
+        driver="GTiff",
+        dtype=rio.uint8,
+        count=1,
+        transform=transform,
+        crs=shapes.crs,
+        compress="lzw",
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+        width=out_shape[1],
+        height=out_shape[0],
+    ) as dst, ProcessPoolExecutor(max_workers=nprocesses) as pool:
+
+        def write(futures):
+            for future in futures:
+                window, raster = future.result()
+                dst.write(raster, indexes=1, window=window)
+
+        pending = set()
+        for task in tasks():
+            if len(pending) >= 2 * nprocesses:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(done)
+            pending.add(pool.submit(_rasterize_window, task))
+        write(pending)
 
 
 if __name__ == "__main__":
@@ -145,22 +199,12 @@ if __name__ == "__main__":
     xs, Xs, ys, Ys = zip(*(determine_cutout_xXyY(cutout) for cutout in cutouts))
     bounds = transform_bounds(CUTOUT_CRS, geo_crs, min(xs), min(ys), max(Xs), max(Ys))
     transform, out_shape = get_transform_and_shape(bounds, res=100)
-    
-    # adjusted boundaries
-    shapes = unify_protected_shape_areas(shapefiles, geo_crs)
-    raster = ~geometry_mask(shapes.geometry, out_shape, transform)
-    raster = raster.astype(rio.uint8)
 
-    with rio.open(
-        snakemake.output[0],
-        "w",
-        driver="GTiff",
-        dtype=rio.uint8,
-        count=1,
-        transform=transform,
-        crs=geo_crs,
-        compress="lzw",
-        width=raster.shape[1],
-        height=raster.shape[0],
-    ) as dst:
-        dst.write(raster, indexes=1)
\ No newline at end of file
+    # adjusted boundaries
+    shapes = load_protected_shape_areas(shapefiles, geo_crs)
+    logger.info(
+        f"Rasterising {len(shapes)} protected areas onto a {out_shape[0]}x{out_shape[1]} grid"
+    )
+    rasterize_tiled(
+        shapes, transform, out_shape, snakemake.output[0], nprocesses=snakemake.threads
+    )
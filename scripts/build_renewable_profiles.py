@@ -19,9 +19,14 @@ Relevant settings
     snapshots:
     atlite:
         nprocesses:
+        availability_tile_size:
+        combine_technologies:
+        subset_cutouts:
+        generation_cache_dir:
     renewable:
         {technology}:
             cutout:
+            weather_cutouts:
             corine:
             grid_codes:
             distance:
@@ -48,10 +53,14 @@ Inputs
         :scale: 50 %
     **Source:** `GEBCO <https://www.gebco.net/data_and_products/images/gebco_2019_grid_image.jpg>`_
 - ``resources/natura.tiff``: confer :ref:`natura`
+- ``resources/eligibility_{technology}_{resarea}_{confighash}.tif``: (if ``enable: build_eligibility_raster``) confer :mod:`build_eligibility_raster`
 - ``resources/offshore_shapes.geojson``: confer :ref:`shapes`
 - ``resources/regions_onshore.geojson``: (if not offshore wind), confer :ref:`busregions`
 - ``resources/regions_offshore.geojson``: (if offshore wind), :ref:`busregions`
 - ``"cutouts/" + config["renewable"][{technology}]['cutout']``: :ref:`cutout`
+- ``resources/cutouts/{cutout}_{technology}_{regions}_{resarea}.nc``: (if ``atlite: subset_cutouts``) instead of the cutouts, confer :mod:`build_technology_cutout`
+- ``"cutouts/" + config["renewable"][{technology}]['weather_cutouts']``: further weather years on the grid of ``cutout``
+- ``resources/wind_correction_{cutout}.nc``: (if onwind and ``atlite: apply_wind_correction``) confer :mod:`build_wind_correction` or :mod:`apply_wind_correction`
 - ``networks/base.nc``: :ref:`base`
 Outputs
 -------
@@ -72,6 +81,15 @@ Outputs
     average_distance     bus         average distance of units in the Voronoi cell to the
                                      grid node (in km)
     -------------------  ----------  ---------------------------------------------------------
+    layout_bus           layout_     bus of the non-zero entries of the sparse (bus x cell)
+                         entry       layout matrix
+    -------------------  ----------  ---------------------------------------------------------
+    layout_cell          layout_     cutout cell of the entries, counted along the stacked
+                         entry       (y, x) grid
+    -------------------  ----------  ---------------------------------------------------------
+    layout               layout_     layout of generator units of the entries
+                         entry
+    -------------------  ----------  ---------------------------------------------------------
     underwater_fraction  bus         fraction of the average connection distance which is
                                      under water (only for offshore)
     ===================  ==========  =========================================================
@@ -130,6 +148,20 @@ at cells with a higher capacity factor.
     :align: center
 This layout is then used to compute the generation availability time series
 from the weather data cutout from ``atlite``.
+With ``weather_cutouts`` the same layout is applied to the cutout of each further
+weather year in turn, the yearly profiles are appended along ``time`` and leap
+days are removed.
+With ``atlite: combine_technologies`` the rule ``build_renewable_profiles_combined``
+builds the profiles of all technologies in one job, sharing the cutout, the dask
+cluster, the regions, the resource areas and the cell areas between them. The
+protected area and land cover layers of technologies with the same settings are
+rasterised once into a temporary eligibility raster.
+With ``atlite: generation_cache_dir`` the conversion function runs once per
+cutout, technology and ``resource`` configuration with an identity matrix, and
+the hourly generation of every cell is cached there. The capacity factors, the
+layout and the per-bus profiles are then reduced from the cache, so changing
+``capacity_per_sqkm``, ``correction_factor``, the exclusions or the regions does
+not convert the weather data again.
 Two methods are available to compute the maximal installable potential for the
 node (`p_nom_max`): ``simple`` and ``conservative``:
 - ``simple`` adds up the installable potentials of the individual grid cells.
@@ -141,21 +173,25 @@ node (`p_nom_max`): ``simple`` and ``conservative``:
   reached.
 """
 import functools
+import hashlib
+import json
 import logging
+import os
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor
 import pypsa
 import atlite
 import pandas as pd
 import geopandas as gpd
 import numpy as np
 import progressbar as pgb
+import scipy.sparse as sp
 import xarray as xr
-import rioxarray
-import rasterio
-from _helpers import configure_logging
+from _helpers import configure_logging, file_fingerprint, load_geometries
 from dask.distributed import Client, LocalCluster
 from pypsa.geo import haversine
-from shapely.geometry import LineString
+from shapely.geometry import LineString, box
 
 logger = logging.getLogger(__name__)
 
@@ -163,72 +199,125 @@ SALANDCOVER_CRS = "EPSG:32635"
 
 def remove_leap_day(df):
     return df[~((df.index.month == 2) & (df.index.day == 29))]
-#%%
-if __name__ == "__main__":
-    if "snakemake" not in globals():
-        from _helpers import mock_snakemake
 
-        #snakemake = mock_snakemake("build_renewable_profiles", technology="onwind")
-        snakemake = mock_snakemake('build_renewable_profiles', technology='solar',
-                    **{'regions':'27-supply',
-                    'resarea':'redz'})
-    configure_logging(snakemake)
-    pgb.streams.wrap_stderr()
 
-    nprocesses = int(snakemake.threads)
-    noprogress = not snakemake.config["atlite"].get("show_progress", False)
-    config = snakemake.config["renewable"][snakemake.wildcards.technology]
-    resource = config["resource"]  # pv panel config / wind turbine config
-    correction_factor = config.get("correction_factor", 1.0)
-    capacity_per_sqkm = config["capacity_per_sqkm"]
-    p_nom_max_meth = config.get("potential", "conservative")
+def as_list(files):
+    return [files] if isinstance(files, str) else list(files)
 
-    if correction_factor != 1.0:
-        logger.info(f"correction_factor is set as {correction_factor}")
 
-    cluster = LocalCluster(n_workers=nprocesses, threads_per_worker=1)
-    client = Client(cluster, asynchronous=True)
+def open_cutout(fn, wind_correction=None):
+    """
+    Opens the cutout ``fn``. With ``wind_correction``, the scaling field of
+    :mod:`build_wind_correction` is applied lazily to the wind speeds, so that
+    ``wnd100m`` is only ever scaled chunk by chunk when atlite reads it.
+    """
+    cutout = atlite.Cutout(fn)
+    if wind_correction:
+        wnd100m = cutout.data.wnd100m
+        correction = xr.open_dataarray(wind_correction)
+        correction = correction.reindex_like(wnd100m, method="nearest", tolerance=1e-6)
+        cutout.data["wnd100m"] = (wnd100m * correction).transpose(*wnd100m.dims).assign_attrs(wnd100m.attrs)
+    return cutout
 
-    cutout = atlite.Cutout(snakemake.input["cutout"])
-    regions = gpd.read_file(snakemake.input.regions).to_crs(snakemake.config["crs"]["geo_crs"])
-    assert not regions.empty, (
-        f"List of regions in {snakemake.input.regions} is empty, please "
-        "disable the corresponding renewable technology"
-    )
 
-    if ((snakemake.wildcards.technology=='onwind') &
-        (snakemake.config["atlite"]["apply_wind_correction"])):
-        gwa_data = rioxarray.open_rasterio(snakemake.input.gwa_map)
-        ds=gwa_data.sel(band=1, x=slice(*cutout.extent[[0,1]]), y=slice(*cutout.extent[[3,2]]))
-        ds=ds.where(ds!=-999)
-        ds=atlite.gis.regrid(ds,cutout.data.x, cutout.data.y,resampling=rasterio.warp.Resampling.average)
-        cutout.data.wnd100m.mean("time").plot()
+def generation_cache_file(cache_dir, cutout, technology, resource, wind_correction=None):
+    """
+    Returns the path of the cached per-cell generation of ``technology`` on
+    ``cutout``. The name hashes the cutout file with its attributes, grid and
+    time range, the content of the wind correction (for wind conversions only)
+    and the ``resource`` configuration, so that any change to them is a cache miss.
+    """
+    resource = {k: v for k, v in resource.items() if k != "dask_kwargs"}
+    time = cutout.coords["time"].values
+    key = json.dumps(
+        [resource, dict(cutout.data.attrs), cutout.shape, cutout.bounds,
+         str(time[0]), str(time[-1]), len(time)],
+        sort_keys=True, default=str,
+    ) + file_fingerprint(cutout.path)
+    # the correction only scales the wind speeds
+    if wind_correction and resource.get("method") == "wind":
+        with open(wind_correction, "rb") as f:
+            key += hashlib.md5(f.read()).hexdigest()
+    name = os.path.splitext(os.path.basename(cutout.path))[0]
+    digest = hashlib.md5(key.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}_{technology}_{digest}.nc")
 
-        bias_correction=ds/cutout.data.wnd100m.mean("time")
-        bias_correction=bias_correction.fillna(1)
-        cutout.data.wnd100m.values=(bias_correction*cutout.data.wnd100m).transpose('time', 'y', 'x').values
 
-    # do not pull up, set_index does not work if geo dataframe is empty
-    regions = regions.set_index("name").rename_axis("bus")
-    buses = regions.index
-    area_crs = snakemake.config["crs"]["area_crs"]
-    resarea = gpd.read_file(snakemake.input.resarea).to_crs(area_crs)
+def cell_generation(cutout, method, resource, fn):
+    """
+    Returns the hourly generation of ``method`` in every cell of ``cutout``
+    along the stacked ``(y, x)`` grid. It is converted once with an identity
+    matrix and written to ``fn``, later calls read it lazily from there.
+    """
+    if not os.path.exists(fn):
+        ncells = cutout.shape[0] * cutout.shape[1]
+        logger.info(f"Converting {method} generation of {ncells} cells into {fn}")
+        generation = getattr(cutout, method)(
+            matrix=sp.identity(ncells, format="csr"),
+            index=pd.RangeIndex(ncells, name="cell"),
+            **resource,
+        )
+        generation = generation.transpose("time", "cell").rename("generation")
+        encoding = dict(
+            zlib=True,
+            complevel=4,
+            chunksizes=(min(100, generation.sizes["time"]), ncells),
+        )
+        os.makedirs(os.path.dirname(fn) or ".", exist_ok=True)
+        tmp = fn + ".tmp"
+        generation.to_netcdf(tmp, encoding={"generation": encoding})
+        os.replace(tmp, fn)
+    else:
+        logger.info(f"Reading cached {method} generation from {fn}")
+    return xr.open_dataarray(fn, chunks={"time": 100})
+
 
+def aggregate_generation(generation, matrix, layout, index, dask_kwargs=None):
+    """
+    Returns the per unit profile and the capacity of each bus from the per-cell
+    ``generation``, as the conversion functions of atlite with ``matrix``,
+    ``layout``, ``per_unit=True`` and ``return_capacity=True``.
+    """
+    weights = (matrix * layout.stack(spatial=["y", "x"])).transpose(matrix.dims[0], "spatial")
+    weights = xr.DataArray(weights.values, [index, generation.coords["cell"]])
+    capacity = weights.sum("cell")
+    profile = xr.dot(generation, weights, dims="cell").load(**(dask_kwargs or {}))
+    profile = (profile / capacity.where(capacity != 0)).fillna(0.0)
+    return profile.transpose("time", index.name), capacity
+
+
+def build_excluder(config, inputs, area_crs, resarea=None):
+    """
+    Returns the exclusion container of a technology: the resource areas, the
+    protected areas and the land cover codes with their distance buffers.
+    ``resarea`` may be passed if it was already read for another technology.
+    """
     res = config.get("excluder_resolution", 100)
     excluder = atlite.ExclusionContainer(crs=3035, res=res)
 
     # limit to resareas REDZ or CORRIDORS
+    if resarea is None:
+        resarea = load_geometries(inputs.resarea).to_crs(area_crs)
     excluder.add_geometry(resarea.geometry,invert=True)
 
+    add_exclusion_layers(excluder, config, inputs)
+    return excluder
+
+
+def add_exclusion_layers(excluder, config, inputs):
+    """
+    Adds the raster layers of a technology to ``excluder``: the protected areas
+    and the land cover codes with their distance buffers.
+    """
     # exclude protected and conservation areas
     if config["natura"]:
-        excluder.add_raster(snakemake.input.natura, nodata=0, allow_no_overlap=True)
+        excluder.add_raster(inputs.natura, nodata=0, allow_no_overlap=True)
 
     # exclude landuse types given by the grid codes
     if "salandcover" in config and config["salandcover"]:
         salandcover = config["salandcover"]
         excluder.add_raster(
-            snakemake.input.salandcover,
+            inputs.salandcover,
             codes=salandcover["grid_codes"],
             invert=True,
             crs=SALANDCOVER_CRS,
@@ -236,82 +325,371 @@ if __name__ == "__main__":
         # add a distance buffer to the landuse gridcode
         if "distance" in salandcover and config["salandcover"]["distance"] > 0:
             excluder.add_raster(
-                snakemake.input.salandcover,
+                inputs.salandcover,
                 codes=salandcover["distance_grid_codes"],
                 buffer=salandcover["distance"],
                 crs=SALANDCOVER_CRS,
             )
 
-    #kwargs = dict(nprocesses=nprocesses, disable_progressbar=noprogress)
-    if noprogress:
-        logger.info("Calculate landuse availabilities...")
-        start = time.time()
-        availability = cutout.availabilitymatrix(regions, excluder)#, **kwargs) #TODO fix to run in parallel
-        duration = time.time() - start
-        logger.info(f"Completed availability calculation ({duration:2.2f}s)")
+
+def exclusion_layers_key(config):
+    """
+    Returns a key of the settings of :func:`add_exclusion_layers`, or None if
+    the technology has no raster layers.
+    """
+    if not (config["natura"] or config.get("salandcover")):
+        return None
+    return json.dumps(
+        [config["natura"], config.get("salandcover"), config.get("excluder_resolution", 100)],
+        sort_keys=True,
+    )
+
+
+def write_exclusion_layers(config, inputs, bounds, fn):
+    """
+    Writes the raster layers of :func:`add_exclusion_layers` as one eligibility
+    raster over ``bounds`` (in EPSG:3035) to ``fn``, for technologies sharing them.
+    """
+    from build_eligibility_raster import write_eligibility
+
+    layers = atlite.ExclusionContainer(crs=3035, res=config.get("excluder_resolution", 100))
+    add_exclusion_layers(layers, config, inputs)
+    write_eligibility(layers, bounds, fn)
+    return fn
+
+
+def availability_tasks(shapes, tile_size=None):
+    """
+    Returns the tasks of the availability calculation as tuples of the
+    position of the region and the geometry to compute. With ``tile_size``
+    (in units of the crs of ``shapes``) regions are split into square tiles,
+    which bounds the raster window read by a single task.
+    """
+    tasks = []
+    for i, (bus, geometry) in enumerate(shapes.items()):
+        if not tile_size:
+            tasks.append((i, shapes.loc[[bus]]))
+            continue
+        minx, miny, maxx, maxy = geometry.bounds
+        for x0 in np.arange(minx, maxx, tile_size):
+            for y0 in np.arange(miny, maxy, tile_size):
+                tile = geometry.intersection(box(x0, y0, x0 + tile_size, y0 + tile_size))
+                if not tile.is_empty:
+                    tasks.append((i, gpd.GeoSeries([tile], crs=shapes.crs)))
+    return tasks
+
+
+def _init_availability_worker(excluder, dst):
+    global _excluder, _dst
+    excluder.open_files()
+    _excluder, _dst = excluder, dst
+
+
+def _task_availability(task):
+    i, geometry = task
+    masked = atlite.gis.shape_availability_reprojected(geometry, _excluder, *_dst)[0]
+    # rows run north to south on cutout.transform_r, flip them onto the ascending y
+    return i, sp.csr_matrix(masked[::-1].ravel())
+
+
+def compute_availabilitymatrix(cutout, regions, excluder, nprocesses=1, tile_size=None):
+    """
+    Parallel version of :func:`atlite.Cutout.availabilitymatrix`. The regions (or
+    their tiles) are distributed over a process pool, each worker only reads the
+    raster windows of its geometry and returns a sparse row over the cutout
+    cells. Tiles are eligible area fractions of disjoint parts of a region, so
+    their rows add up to the row of the region up to the resolution of the
+    exclusion rasters, whose pixels are assigned to a tile by their centre.
+    """
+    shapes = regions.geometry.to_crs(excluder.crs)
+    tasks = availability_tasks(shapes, tile_size)
+    dst = (cutout.transform_r, cutout.crs, cutout.shape)
+    logger.info(f"Computing availability of {len(shapes)} regions in {len(tasks)} tasks")
+
+    with ProcessPoolExecutor(
+        max_workers=nprocesses,
+        initializer=_init_availability_worker,
+        initargs=(excluder, dst),
+    ) as pool:
+        results = list(pool.map(_task_availability, tasks))
+
+    index, rows = zip(*results)
+    merge = sp.csr_matrix(
+        (np.ones(len(index)), (index, np.arange(len(index)))),
+        shape=(len(shapes), len(index)),
+    )
+    matrix = (merge @ sp.vstack(rows)).tocsr()
+
+    coords = [(shapes.index), ("y", cutout.data.y.data), ("x", cutout.data.x.data)]
+    return xr.DataArray(matrix.toarray().reshape(len(shapes), *cutout.shape), coords=coords)
+
+
+def layout_statistics(layoutmatrix, cells, bus_coords):
+    """
+    Returns the average distance of the layout of each bus to the bus and the
+    centre of mass of the layout from the sparse (bus x cell) ``layoutmatrix``.
+    ``cells`` and ``bus_coords`` hold the ``x`` and ``y`` coordinates of the
+    cutout cells and the buses.
+    """
+    total = np.asarray(layoutmatrix.sum(axis=1)).ravel()
+    with np.errstate(divide="ignore"):
+        weights = sp.diags(np.where(total != 0, 1 / total, np.nan)) @ layoutmatrix
+
+    distances = haversine(bus_coords[["x", "y"]].values, cells[["x", "y"]].values)
+    average_distance = np.asarray(weights.multiply(distances).sum(axis=1)).ravel()
+    centre_of_mass = weights @ cells[["x", "y"]].values
+
+    # buses without any layout have no distance, as in the dense calculation
+    average_distance[total == 0] = np.nan
+    centre_of_mass[total == 0] = np.nan
+    return average_distance, centre_of_mass
+
+
+def sparse_layout_dataset(layoutmatrix, buses):
+    """
+    Returns the non-zero entries of the sparse (bus x cell) ``layoutmatrix`` as a
+    dataset along the dimension ``layout_entry``, cells are counted along the
+    stacked ``(y, x)`` grid of the cutout.
+    """
+    layoutmatrix = layoutmatrix.tocoo()
+    return xr.Dataset(
+        {
+            "layout_bus": ("layout_entry", buses[layoutmatrix.row]),
+            "layout_cell": ("layout_entry", layoutmatrix.col),
+            "layout": ("layout_entry", layoutmatrix.data),
+        }
+    )
+
+#%%
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        #snakemake = mock_snakemake("build_renewable_profiles", technology="onwind")
+        snakemake = mock_snakemake('build_renewable_profiles', technology='solar',
+                    **{'regions':'27-supply',
+                    'resarea':'redz'})
+    configure_logging(snakemake)
+    pgb.streams.wrap_stderr()
+
+    nprocesses = int(snakemake.threads)
+    noprogress = not snakemake.config["atlite"].get("show_progress", False)
+    generation_cache_dir = snakemake.config["atlite"].get("generation_cache_dir")
+
+    # a single technology, or all technologies of build_renewable_profiles_combined
+    if snakemake.wildcards.get("technology"):
+        technologies = [snakemake.wildcards.technology]
+        eligibility = {technologies[0]: snakemake.input.get("eligibility")}
+        outputs = {technologies[0]: snakemake.output.profile}
     else:
-        availability = cutout.availabilitymatrix(regions, excluder)#, **kwargs)
+        technologies = [t for t in snakemake.config["renewable"] if t != "hydro"]
+        eligibility = {t: snakemake.input.get(f"eligibility_{t}") for t in technologies}
+        outputs = {t: getattr(snakemake.output, f"profile_{t}") for t in technologies}
+
+    cluster = LocalCluster(n_workers=nprocesses, threads_per_worker=1)
+    client = Client(cluster, asynchronous=True)
+
+    # the first cutout determines the layout, further weather years reuse it
+    cutout_fns = [snakemake.input.cutout] + as_list(snakemake.input.get("weather_cutouts", []))
+    wind_corrections = as_list(snakemake.input.get("wind_correction", [])) or [None] * len(cutout_fns)
+    cutout = open_cutout(cutout_fns[0], wind_corrections[0])
+    regions = gpd.read_file(snakemake.input.regions).to_crs(snakemake.config["crs"]["geo_crs"])
+    assert not regions.empty, (
+        f"List of regions in {snakemake.input.regions} is empty, please "
+        "disable the corresponding renewable technology"
+    )
+
+    # do not pull up, set_index does not work if geo dataframe is empty
+    regions = regions.set_index("name").rename_axis("bus")
+    buses = regions.index
+    area_crs = snakemake.config["crs"]["area_crs"]
+    resarea = load_geometries(snakemake.input.resarea).to_crs(area_crs)
 
     area = cutout.grid.to_crs(3035).area / 1e6
     area = xr.DataArray(
         area.values.reshape(cutout.shape), [cutout.coords["y"], cutout.coords["x"]]
     )
 
-    potential = capacity_per_sqkm * availability.sum("bus") * area
-    func = getattr(cutout, resource.pop("method"))
-    resource["dask_kwargs"] = {"scheduler": client}
-    capacity_factor = correction_factor * func(capacity_factor=True, **resource)
-    layout = capacity_factor * area * capacity_per_sqkm
-    profile, capacities = func(
-        matrix=availability.stack(spatial=["y", "x"]),
-        layout=layout,
-        index=buses,
-        per_unit=True,
-        return_capacity=True,
-        **resource,
-    )
+    # raster layers with the same settings in several technologies are
+    # rasterised once over the regions and read as a single aligned layer
+    layer_keys = {
+        t: exclusion_layers_key(snakemake.config["renewable"][t])
+        for t in technologies
+        if not eligibility[t]
+    }
+    shared_keys = {
+        k for k in layer_keys.values()
+        if k is not None and list(layer_keys.values()).count(k) > 1
+    }
+    shared_layers = {}
+    shared_dir = tempfile.TemporaryDirectory()
 
-    logger.info(f"Calculating maximal capacity per bus (method '{p_nom_max_meth}')")
-    if p_nom_max_meth == "simple":
-        p_nom_max = capacity_per_sqkm * availability @ area
-    elif p_nom_max_meth == "conservative":
-        max_cap_factor = capacity_factor.where(availability != 0).max(["x", "y"])
-        p_nom_max = capacities / max_cap_factor
-    else:
-        raise AssertionError(
-            'Config key `potential` should be one of "simple" '
-            f'(default) or "conservative", not "{p_nom_max_meth}"'
+    results = {}
+    for technology in technologies:
+        config = snakemake.config["renewable"][technology]
+        resource = config["resource"].copy()  # pv panel config / wind turbine config
+        correction_factor = config.get("correction_factor", 1.0)
+        capacity_per_sqkm = config["capacity_per_sqkm"]
+        p_nom_max_meth = config.get("potential", "conservative")
+
+        if correction_factor != 1.0:
+            logger.info(f"correction_factor of {technology} is set as {correction_factor}")
+
+        if eligibility[technology]:
+            # all exclusions rasterised by build_eligibility_raster in the target crs and resolution
+            res = config.get("excluder_resolution", 100)
+            excluder = atlite.ExclusionContainer(crs=3035, res=res)
+            excluder.add_raster(eligibility[technology], codes=[1], invert=True)
+        elif layer_keys[technology] in shared_keys:
+            key = layer_keys[technology]
+            if key not in shared_layers:
+                logger.info(f"Rasterising the exclusion layers shared with {technology}")
+                shared_layers[key] = write_exclusion_layers(
+                    config,
+                    snakemake.input,
+                    regions.to_crs(3035).total_bounds,
+                    os.path.join(shared_dir.name, f"layers_{len(shared_layers)}.tif"),
+                )
+            excluder = atlite.ExclusionContainer(crs=3035, res=config.get("excluder_resolution", 100))
+            excluder.add_geometry(resarea.geometry, invert=True)
+            excluder.add_raster(shared_layers[key], codes=[1], invert=True)
+        else:
+            excluder = build_excluder(config, snakemake.input, area_crs, resarea)
+
+        logger.info(f"Calculate landuse availabilities of {technology}...")
+        start = time.time()
+        availability = compute_availabilitymatrix(
+            cutout,
+            regions,
+            excluder,
+            nprocesses=nprocesses,
+            tile_size=snakemake.config["atlite"].get("availability_tile_size"),
         )
+        duration = time.time() - start
+        logger.info(f"Completed availability calculation ({duration:2.2f}s)")
 
-    logger.info("Calculate average distances.")
-    layoutmatrix = (layout * availability).stack(spatial=["y", "x"])
-
-    coords = cutout.grid[["x", "y"]]
-    bus_coords = regions[["x", "y"]]
-
-    average_distance = []
-    centre_of_mass = []
-    for bus in buses:
-        row = layoutmatrix.sel(bus=bus).data
-        nz_b = row != 0
-        row = row[nz_b]
-        co = coords[nz_b]
-        distances = haversine(bus_coords.loc[bus], co)
-        average_distance.append((distances * (row / row.sum())).sum())
-        centre_of_mass.append(co.values.T @ (row / row.sum()))
-
-    average_distance = xr.DataArray(average_distance, [buses])
-    centre_of_mass = xr.DataArray(centre_of_mass, [buses, ("spatial", ["x", "y"])])
-
-    ds = xr.merge(
-        [
-            (correction_factor * profile).rename("profile"),
-            capacities.rename("weight"),
-            p_nom_max.rename("p_nom_max"),
-            potential.rename("potential"),
-            average_distance.rename("average_distance"),
-        ]
-    )
-    ds.sel(time=~((ds.time.dt.month == 2) & (ds.time.dt.day == 29)))
+        potential = capacity_per_sqkm * availability.sum("bus") * area
+        method = resource.pop("method")
+        func = getattr(cutout, method)
+        resource["dask_kwargs"] = {"scheduler": client}
+        if generation_cache_dir:
+            # one conversion pass per cutout and resource config, reused across runs
+            generation = cell_generation(
+                cutout,
+                method,
+                resource,
+                generation_cache_file(
+                    generation_cache_dir, cutout, technology,
+                    dict(resource, method=method), wind_corrections[0],
+                ),
+            )
+            capacity_factor = correction_factor * xr.DataArray(
+                generation.mean("time").load(**resource["dask_kwargs"]).values.reshape(cutout.shape),
+                [cutout.coords["y"], cutout.coords["x"]],
+            )
+            layout = capacity_factor * area * capacity_per_sqkm
+            profile, capacities = aggregate_generation(
+                generation,
+                availability.stack(spatial=["y", "x"]),
+                layout,
+                buses,
+                resource["dask_kwargs"],
+            )
+        else:
+            capacity_factor = correction_factor * func(capacity_factor=True, **resource)
+            layout = capacity_factor * area * capacity_per_sqkm
+            profile, capacities = func(
+                matrix=availability.stack(spatial=["y", "x"]),
+                layout=layout,
+                index=buses,
+                per_unit=True,
+                return_capacity=True,
+                **resource,
+            )
+
+        logger.info(f"Calculating maximal capacity per bus (method '{p_nom_max_meth}')")
+        if p_nom_max_meth == "simple":
+            p_nom_max = capacity_per_sqkm * availability @ area
+        elif p_nom_max_meth == "conservative":
+            max_cap_factor = capacity_factor.where(availability != 0).max(["x", "y"])
+            p_nom_max = capacities / max_cap_factor
+        else:
+            raise AssertionError(
+                'Config key `potential` should be one of "simple" '
+                f'(default) or "conservative", not "{p_nom_max_meth}"'
+            )
+
+        logger.info("Calculate average distances.")
+        layoutmatrix = sp.csr_matrix(
+            (layout * availability).stack(spatial=["y", "x"]).transpose("bus", "spatial").values
+        )
+        average_distance, centre_of_mass = layout_statistics(
+            layoutmatrix, cutout.grid, regions.loc[buses]
+        )
+
+        average_distance = xr.DataArray(average_distance, [buses])
+        centre_of_mass = xr.DataArray(centre_of_mass, [buses, ("spatial", ["x", "y"])])
+
+        results[technology] = dict(
+            method=method,
+            resource=resource,
+            matrix=availability.stack(spatial=["y", "x"]),
+            layout=layout,
+            correction_factor=correction_factor,
+            profiles=[profile],
+            data=[
+                capacities.rename("weight"),
+                p_nom_max.rename("p_nom_max"),
+                potential.rename("potential"),
+                average_distance.rename("average_distance"),
+                sparse_layout_dataset(layoutmatrix, buses),
+            ],
+        )
+
+    shared_dir.cleanup()
+
+    # stream over the further weather years, holding one cutout at a time
+    for fn, wind_correction in zip(cutout_fns[1:], wind_corrections[1:]):
+        weather_cutout = open_cutout(fn, wind_correction)
+        assert weather_cutout.shape == cutout.shape, (
+            f"Cutout {fn} does not share the grid of {cutout_fns[0]}"
+        )
+        for technology, result in results.items():
+            logger.info(f"Calculating {technology} profile for weather year of {fn}")
+            if generation_cache_dir:
+                generation = cell_generation(
+                    weather_cutout,
+                    result["method"],
+                    result["resource"],
+                    generation_cache_file(
+                        generation_cache_dir, weather_cutout, technology,
+                        dict(result["resource"], method=result["method"]), wind_correction,
+                    ),
+                )
+                profile, _ = aggregate_generation(
+                    generation,
+                    result["matrix"],
+                    result["layout"],
+                    buses,
+                    result["resource"]["dask_kwargs"],
+                )
+                generation.close()
+            else:
+                profile = getattr(weather_cutout, result["method"])(
+                    matrix=result["matrix"],
+                    layout=result["layout"],
+                    index=buses,
+                    per_unit=True,
+                    **result["resource"],
+                )
+            result["profiles"].append(profile)
+        weather_cutout.data.close()
+
+    for technology, result in results.items():
+        profile = xr.concat(result["profiles"], dim="time")
+        ds = xr.merge(
+            [(result["correction_factor"] * profile).rename("profile")] + result["data"]
+        )
+        ds = ds.sel(time=~((ds.time.dt.month == 2) & (ds.time.dt.day == 29)))
 
-    ds.to_netcdf(snakemake.output.profile)
+        ds.to_netcdf(outputs[technology])
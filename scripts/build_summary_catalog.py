@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Collects the summaries written next to each solved network into a single catalog.
+
+Inputs
+------
+
+- ``results/summaries/solved_{model_file}_{regions}_{resarea}_l{ll}_{opts}.parquet``: confer :mod:`solve_network`
+
+Outputs
+-------
+
+- ``results/summaries/catalog.parquet``: Summaries of all scenarios in one long table with the
+  columns ``quantity``, ``carrier``, ``period``, ``unit``, ``value`` and one column per wildcard.
+
+Description
+-----------
+
+Cross-scenario comparisons can be made from the catalog without opening the solved networks, e.g.
+
+.. code:: python
+
+    catalog = pd.read_parquet("results/summaries/catalog.parquet")
+    catalog.query("quantity == 'capacity'").pivot_table(
+        index="carrier", columns=["opts", "period"], values="value"
+    )
+"""
+
+import logging
+
+import pandas as pd
+from _helpers import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_catalog(fns):
+    """
+    Concatenates the summaries ``fns`` into one table, scenarios with
+    different wildcards keep the union of the wildcard columns.
+    """
+    return pd.concat([pd.read_parquet(fn) for fn in fns], ignore_index=True)
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake("build_summary_catalog")
+    configure_logging(snakemake)
+
+    catalog = build_catalog(snakemake.input)
+    logger.info(f"Collected {len(snakemake.input)} summaries into {snakemake.output[0]}")
+    catalog.to_parquet(snakemake.output[0], index=False)
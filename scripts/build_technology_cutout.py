@@ -0,0 +1,118 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Derives the cutout read by :mod:`build_renewable_profiles` for one technology,
+region layer and resource area: only the features needed by the conversion
+function, clipped to the extent of the regions and resource areas.
+
+Relevant Settings
+-----------------
+
+.. code:: yaml
+
+    atlite:
+        subset_cutouts:
+
+    renewable:
+        {technology}:
+            resource:
+                method:
+
+.. seealso::
+    Documentation of the configuration file ``config.yaml`` at
+    :ref:`atlite_cf`, :ref:`renewable_cf`
+
+Inputs
+------
+
+- ``cutouts/{cutout}.nc``: confer :ref:`cutout`
+- ``resources/buses_{regions}.geojson``: confer :mod:`build_topology`
+- ``resources/geometries/resarea/{resarea}_geo.parquet``: confer :mod:`build_geometry_cache`
+
+Outputs
+-------
+
+- ``resources/cutouts/{cutout}_{technology}_{regions}_{resarea}.nc``: Subset of the cutout,
+  chunked along time with all cells of a time step in one chunk.
+
+Description
+-----------
+
+Land outside of the resource areas is excluded by :mod:`build_renewable_profiles`, so
+cells outside of the bounding box of the resource areas within the regions
+(padded by one cell) never carry any capacity and are dropped.
+"""
+
+import logging
+
+import atlite
+import geopandas as gpd
+from _helpers import configure_logging, load_geometries
+
+logger = logging.getLogger(__name__)
+
+# atlite features required by the conversion functions
+METHOD_FEATURES = {
+    "wind": ["wind"],
+    "pv": ["influx", "temperature"],
+}
+
+CHUNKS_TIME = 100
+
+
+def subset_bounds(regions, resarea):
+    """Returns the bounds of the resource areas within ``regions``."""
+    minx, miny, maxx, maxy = regions.total_bounds
+    rminx, rminy, rmaxx, rmaxy = resarea.total_bounds
+    return max(minx, rminx), max(miny, rminy), min(maxx, rmaxx), min(maxy, rmaxy)
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake(
+            "build_technology_cutout",
+            cutout="RSA-2012-era5",
+            technology="onwind",
+            regions="27-supply",
+            resarea="redz",
+        )
+    configure_logging(snakemake)
+
+    method = snakemake.config["renewable"][snakemake.wildcards.technology]["resource"]["method"]
+    features = METHOD_FEATURES[method]
+
+    cutout = atlite.Cutout(snakemake.input.cutout)
+    geo_crs = snakemake.config["crs"]["geo_crs"]
+    regions = gpd.read_file(snakemake.input.regions).to_crs(geo_crs)
+    resarea = load_geometries(snakemake.input.resarea).to_crs(geo_crs)
+
+    minx, miny, maxx, maxy = subset_bounds(regions, resarea)
+    variables = [
+        v for v in cutout.data.data_vars if cutout.data[v].attrs.get("feature") in features
+    ]
+    ds = cutout.data[variables].sel(
+        x=slice(minx - cutout.dx, maxx + cutout.dx),
+        y=slice(miny - cutout.dy, maxy + cutout.dy),
+    )
+    ds.attrs.update(cutout.data.attrs)
+
+    logger.info(
+        f"Subsetting {snakemake.wildcards.cutout} to {variables} on "
+        f"{ds.sizes['y']}x{ds.sizes['x']} of {cutout.shape[0]}x{cutout.shape[1]} cells"
+    )
+    encoding = {
+        v: dict(
+            zlib=True,
+            complevel=4,
+            chunksizes=tuple(
+                min(CHUNKS_TIME, ds.sizes[d]) if d == "time" else ds.sizes[d]
+                for d in ds[v].dims
+            ),
+        )
+        for v in variables
+    }
+    ds.to_netcdf(snakemake.output[0], encoding=encoding)
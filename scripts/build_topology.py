@@ -11,6 +11,9 @@ Relevant Settings
 
     snapshots:
 
+    topology:
+        population_cache_dir:
+
     electricity:
         voltages:
 
@@ -32,7 +35,7 @@ Relevant Settings
 Inputs
 ------
 
-- ``data/bundle/supply_regions/{regions}.shp``:  Shape file for different supply regions.
+- ``resources/geometries/supply_regions/{regions}_geo.parquet``: Supply regions, confer :mod:`build_geometry_cache`
 - ``data/bundle/South_Africa_100m_Population/ZAF15adjv4.tif``: Raster file of South African population from 
 - ``data/num_lines.xlsx``: confer :ref:`links`
 
@@ -47,55 +50,118 @@ Outputs
 import networkx as nx
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import LineString
+from shapely.geometry import LineString, box
 import numpy as np
-import rasterstats
-from operator import attrgetter
+import rasterio
+from rasterio.features import rasterize
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
+from pathlib import Path
 from vresutils.costdata import annuity
 from vresutils.shapes import haversine
 import os
 import pypsa
-from _helpers import save_to_geojson
+from _helpers import file_fingerprint, load_geometries, save_to_geojson
 
 def convert_lines_to_gdf(lines,centroids):
     gdf = gpd.GeoDataFrame(lines)
-    linestrings = []
-    for i, row in lines.iterrows():
-        point1 = centroids[row['bus0']]
-        point2 = centroids[row['bus1']]
-        linestring = LineString([point1, point2])
-        linestrings.append(linestring)
-    gdf['geometry']=linestrings
+    coords = np.stack(
+        [line_coords(lines['bus0'], centroids), line_coords(lines['bus1'], centroids)],
+        axis=1,
+    )
+    gdf['geometry'] = gpd.GeoSeries([LineString(c) for c in coords], index=lines.index)
     return gdf
 
+def line_coords(buses, centroids):
+    """Returns the (x, y) coordinates of the centroids of ``buses`` as an array."""
+    points = centroids.loc[buses]
+    return np.column_stack([points.x.values, points.y.values])
+
+def haversine_lengths(coords0, coords1):
+    """Returns the crow-fly distances in km between the rows of two (x, y) arrays."""
+    lon0, lat0 = np.radians(coords0).T
+    lon1, lat1 = np.radians(coords1).T
+    a = np.sin((lat1 - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(a)) * 6371
+
 def check_centroid_in_region(regions,centroids):
-    idx = regions.index[~centroids.intersects(regions['geometry'])]
-    buffered_regions = regions.buffer(-0.1)
-    boundary = buffered_regions.boundary
-    for i in idx:
-        # Initialize a variable to store the minimum distance
-        min_distance = np.inf
-
-        # Iterate over a range of distances along the boundary
-        for d in np.arange(0, boundary[i].length, 0.01):
-            # Interpolate a point at the current distance
-            p = boundary[i].interpolate(d)
-            # Calculate the distance between the centroid and the interpolated point
-            distance = centroids[i].distance(p)
-            # If the distance is less than the minimum distance, update the minimum distance and the closest point
-            if distance < min_distance:
-                min_distance = distance
-                closest_point = p
-        centroids[i] = closest_point
+    """
+    Moves centroids which lie outside of their region onto the nearest point of
+    the region's boundary buffered inwards by 0.1 degrees, or onto a
+    representative point if the buffered region is empty.
+    """
+    outside = ~centroids.intersects(regions['geometry'])
+    if not outside.any():
+        return centroids
+    centroids = centroids.copy()
+    boundary = regions.loc[outside].buffer(-0.1).boundary
+    nearest = boundary.interpolate(boundary.project(centroids[outside]))
+    empty = boundary.is_empty
+    nearest[empty] = regions.loc[outside].loc[empty, 'geometry'].representative_point()
+    centroids[outside] = nearest
     return centroids
 
 
+def zonal_sum(shapes, raster_fn, window_size=4096):
+    """
+    Returns the sum of the raster values within each of ``shapes``. The raster
+    is read in windows, the shapes intersecting a window are rasterised as
+    labels onto it (pixel centres, as in ``rasterstats.zonal_stats``) and the
+    values are summed per label with ``np.bincount``.
+    """
+    totals = np.zeros(len(shapes) + 1)
+    with rasterio.open(raster_fn) as src:
+        shapes = shapes.to_crs(src.crs)
+        sindex = shapes.sindex
+        for row in range(0, src.height, window_size):
+            for col in range(0, src.width, window_size):
+                window = Window(
+                    col, row, min(window_size, src.width - col), min(window_size, src.height - row)
+                )
+                idx = sindex.query(box(*window_bounds(window, src.transform)), predicate="intersects")
+                if len(idx) == 0:
+                    continue
+                labels = rasterize(
+                    zip(shapes.iloc[idx], idx + 1),
+                    out_shape=(window.height, window.width),
+                    transform=window_transform(window, src.transform),
+                    fill=0,
+                    dtype="int32",
+                )
+                values = src.read(1, window=window, masked=True)
+                valid = (labels > 0) & ~np.ma.getmaskarray(values)
+                totals += np.bincount(
+                    labels[valid], weights=values.data[valid], minlength=len(totals)
+                )
+    return pd.Series(totals[1:], index=shapes.index)
+
+
+def population_per_region(regions, population_fn, layer, regions_fn, cache_dir=None):
+    """
+    Returns the population of each region of ``layer``. With ``cache_dir`` the
+    result is stored under the layer name and fingerprints of the population
+    raster and the regions file, so switching between layers only computes
+    each layer once.
+    """
+    if cache_dir:
+        key = f"{layer}_{file_fingerprint(population_fn)}_{file_fingerprint(regions_fn)}"
+        fn = Path(cache_dir) / f"population_{key}.csv"
+        if fn.exists():
+            return pd.read_csv(fn, index_col=0)["population"].reindex(regions.index)
+
+    population = zonal_sum(regions["geometry"], population_fn)
+
+    if cache_dir:
+        fn.parent.mkdir(parents=True, exist_ok=True)
+        population.rename("population").to_csv(fn)
+    return population
+
+
 def build_topology():
     # Load supply regions and calculate population per region
    
-    regions = gpd.read_file(snakemake.input.supply_regions,
-        layer=snakemake.wildcards.regions,
-    ).to_crs(snakemake.config["crs"]["geo_crs"]).set_index('name')[['geometry']] 
+    regions = load_geometries(snakemake.input.supply_regions).set_index('name')[['geometry']]
     
     centroids = regions['geometry'].centroid #TODO check against original given warning about CRS
     centroids = check_centroid_in_region(regions,centroids)
@@ -105,35 +171,35 @@ def build_topology():
     lines = lines.reset_index()
     lines.columns = ['bus0', 'bus1']
 
-    # Calculate length of lines
-    def haversine_length(row):
-        lon1, lat1, lon2, lat2 = map(np.radians, [centroids[row['bus0']].x, centroids[row['bus0']].y, centroids[row['bus1']].x, centroids[row['bus1']].y])
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-        c = 2 * np.arcsin(np.sqrt(a))
-        return c * 6371
     # If lines is empty, return empty dataframes
     if lines.empty:
         lines = pd.DataFrame(index=[],columns=['name','bus0','bus1','length','num_parallel'])
     else:
-        lines['length'] = lines.apply(haversine_length, axis=1) * snakemake.config['lines']['length_factor']
+        # Calculate length of lines
+        lines['length'] = (
+            haversine_lengths(line_coords(lines['bus0'], centroids), line_coords(lines['bus1'], centroids))
+            * snakemake.config['lines']['length_factor']
+        )
                
     # Initialize buses dataframe
     line_config = snakemake.config['lines']
     v_nom = line_config['v_nom']
     buses = (
         regions.assign(
-            x=centroids.map(attrgetter('x')),
-            y=centroids.map(attrgetter('y')),
+            x=centroids.x,
+            y=centroids.y,
             v_nom=v_nom
         )
     )
 
     # Calculate population in each region
-    population = pd.DataFrame(rasterstats.zonal_stats(regions['geometry'], snakemake.input.population, stats='sum'))['sum']
-    population.index = regions.index
-    buses['population'] = population
+    buses['population'] = population_per_region(
+        regions,
+        snakemake.input.population,
+        snakemake.wildcards.regions,
+        snakemake.input.supply_regions,
+        cache_dir=snakemake.config.get("topology", {}).get("population_cache_dir"),
+    )
 
     # Load num_parallel data and calculate num_parallel column for lines dataframe
     num_lines = pd.read_excel(
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Computes the bias correction of the ERA5 wind speed at 100m for each cell of a
+cutout from the `Global Wind Atlas <https://globalwindatlas.info/en>`_.
+
+Relevant Settings
+-----------------
+
+.. code:: yaml
+
+    atlite:
+        apply_wind_correction:
+
+.. seealso::
+    Documentation of the configuration file ``config.yaml`` at
+    :ref:`atlite_cf`
+
+Inputs
+------
+
+- ``cutouts/{cutout}.nc``: confer :ref:`cutout`
+- ``data/bundle/ZAF_wind-speed_100m.tif``: Global Wind Atlas mean wind speed at 100m
+
+Outputs
+-------
+
+- ``resources/wind_correction_{cutout}.nc``: Scaling factor on the ``(y, x)`` grid of the cutout.
+
+Description
+-----------
+
+The Global Wind Atlas is averaged onto the cutout grid and divided by the mean
+ERA5 wind speed of each cell; cells without atlas data keep a factor of 1.
+:mod:`build_renewable_profiles` multiplies ``wnd100m`` lazily by this factor,
+so the hourly wind speeds are never loaded as a whole and the regridding is
+done once per cutout instead of once per profile.
+"""
+
+import logging
+
+import atlite
+import rasterio
+import rioxarray
+from _helpers import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def wind_correction(cutout, gwa_map):
+    """
+    Returns the ratio of the Global Wind Atlas to the mean ERA5 wind speed at
+    100m in each cell of ``cutout``.
+    """
+    gwa_data = rioxarray.open_rasterio(gwa_map)
+    ds = gwa_data.sel(
+        band=1, x=slice(*cutout.extent[[0, 1]]), y=slice(*cutout.extent[[3, 2]])
+    )
+    ds = ds.where(ds != -999)
+    ds = atlite.gis.regrid(
+        ds, cutout.data.x, cutout.data.y, resampling=rasterio.warp.Resampling.average
+    )
+    correction = ds / cutout.data.wnd100m.mean("time")
+    return correction.fillna(1).drop_vars(["band", "spatial_ref"], errors="ignore")
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake("build_wind_correction", cutout="RSA-2012-era5")
+    configure_logging(snakemake)
+
+    cutout = atlite.Cutout(snakemake.input.cutout)
+    logger.info(
+        f"Computing the wind speed correction of {snakemake.wildcards.cutout} "
+        f"from {snakemake.input.gwa_map}"
+    )
+    correction = wind_correction(cutout, snakemake.input.gwa_map).compute()
+    correction.rename("wind_correction").to_netcdf(snakemake.output[0])
@@ -4,8 +4,8 @@ from itertools import product
 import pandas as pd
 import snakemake #agatha added
 import logging
-import pypsa
 
+from _helpers import load_network_lazy
 from add_electricity import load_costs, update_transmission_costs
 
 idx = pd.IndexSlice
@@ -372,7 +372,8 @@ def make_summaries(networks_dict):
             continue
 
         try:
-            n = pypsa.Network(filename)
+            # only the time series used by the calculate_* functions
+            n = load_network_lazy(filename, attrs=["p", "p0", "p1", "p_max_pu", "p_set", "marginal_price"])
         except OSError:
             logger.warning("Skipping {filename}".format(filename=filename))
             continue
@@ -13,11 +13,10 @@ Description
 -----------
 """
 import logging
-from _helpers import (load_network_for_plots, aggregate_p, aggregate_costs, configure_logging)
+from _helpers import (load_network_for_plots, aggregate_p, aggregate_costs, configure_logging, load_geometries)
 from vresutils import plot as vplot
 
 import pandas as pd
-import geopandas as gpd
 import numpy as np
 import pypsa
 
@@ -322,8 +321,8 @@ if __name__ == "__main__":
     )
     scenario_opts = wildcards.opts.split('-')
 
-    supply_regions = gpd.read_file(snakemake.input.supply_regions).buffer(-0.005) #.to_crs(n.crs)
-    resarea = gpd.read_file(snakemake.input.resarea).to_crs(supply_regions.crs)
+    supply_regions = load_geometries(snakemake.input.supply_regions, display=True).buffer(-0.005) #.to_crs(n.crs)
+    resarea = load_geometries(snakemake.input.resarea, display=True).to_crs(supply_regions.crs)
 
     fig, ax = plt.subplots(figsize=map_figsize, subplot_kw={"projection": ccrs.PlateCarree()})
 
@@ -27,6 +27,7 @@ from _helpers import (
     aggregate_costs,
     aggregate_p,
     configure_logging,
+    load_geometries,
     load_network_for_plots,
 )
 from matplotlib.legend_handler import HandlerPatch
@@ -160,13 +161,13 @@ def plot_map(n, opts, ax=None, attribute="p_nom"):
     linewidth_factor = opts["map"][attribute]["linewidth_factor"]
     bus_size_factor = opts["map"][attribute]["bus_size_factor"]
 
-    supply_regions = gpd.read_file('/home/agatha/Desktop/pypsa-za-master/data/bundle/supply_regions/27-supply.shp')
+    supply_regions = load_geometries(snakemake.input.supply_regions, display=True)
 <<<<<<< HEAD
     # supply_regions = gpd.read_file(snakemake.input.supply_regions)
 =======
     #supply_regions = gpd.read_file(snakemake.input.supply_regions)
 >>>>>>> 837b413abbe71e2ec8092ee04261ac6966eeb173
-    resarea = gpd.read_file(snakemake.input.resarea)
+    resarea = load_geometries(snakemake.input.resarea, display=True)
 
     supply_regions.plot(ax=ax, facecolor='none', edgecolor='black')
     resarea.plot(ax=ax, facecolor='gray', alpha=0.2)
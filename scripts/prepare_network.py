@@ -60,9 +60,8 @@ import re
 
 import numpy as np
 import pandas as pd
-import pypsa
 from pypsa.linopt import get_var, write_objective, define_constraints, linexpr
-from _helpers import configure_logging, clean_pu_profiles, remove_leap_day
+from _helpers import configure_logging, clean_pu_profiles, export_network, load_network, remove_leap_day
 from add_electricity import load_costs, update_transmission_costs
 from concurrent.futures import ProcessPoolExecutor
 import tsam.timeseriesaggregation as tsam
@@ -379,7 +378,7 @@ if __name__ == "__main__":
     ).loc[snakemake.wildcards.model_file]
 
     opts = snakemake.wildcards.opts.split("-")
-    n = pypsa.Network(snakemake.input[0])
+    n = load_network(snakemake.input[0])
     Nyears = n.snapshot_weightings.objective.sum() / 8760.0
     costs = load_costs(
         snakemake.input.model_file,
@@ -470,4 +469,4 @@ if __name__ == "__main__":
         p_nom_max_set=snakemake.config["links"].get("p_nom_max,", np.inf),
     )
     
-    n.export_to_netcdf(snakemake.output[0])
+    export_network(n, snakemake.output[0], snakemake.config.get("export"))
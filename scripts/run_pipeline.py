@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Runs the network stages ``base_network``, ``add_electricity``, ``prepare_network`` and
+``solve_network`` in a single process, handing the network from stage to stage in memory.
+
+Inputs, outputs and the configuration of each stage are resolved from the ``Snakefile``
+with :func:`_helpers.mock_snakemake`, the stage scripts are executed unchanged. Inputs
+which are built by other rules (e.g. renewable profiles or the topology) have to exist.
+Only the outputs of the last stage are written to disk unless ``write_intermediate`` is set.
+
+Usage from the ``scripts`` directory:
+
+.. code:: bash
+
+    python run_pipeline.py model_file=val-LC-IRP regions=27-supply resarea=redz ll=copt opts=LC-2190H
+
+For sensitivity runs the pipeline keeps the networks resident, so that only
+``prepare_network`` and ``solve_network`` are repeated:
+
+.. code:: python
+
+    pipeline = Pipeline(model_file="val-LC-IRP", regions="27-supply", resarea="redz", ll="copt", opts="LC-2190H")
+    pipeline.run()
+    pipeline.run(["prepare_network", "solve_network"], config={"solving": {"options": {"load_shedding": False}}})
+"""
+
+import copy
+import logging
+import os
+import runpy
+import sys
+from pathlib import Path
+
+import _helpers
+from _helpers import NetworkStore, mock_snakemake
+
+logger = logging.getLogger(__name__)
+
+# stages in order of execution with the wildcards of their rules
+STAGES = {
+    "base_network": ["model_file", "regions"],
+    "add_electricity": ["model_file", "regions", "resarea"],
+    "prepare_network": ["model_file", "regions", "resarea", "ll", "opts"],
+    "solve_network": ["model_file", "regions", "resarea", "ll", "opts"],
+}
+
+
+def update_config(config, updates):
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            update_config(config[key], value)
+        else:
+            config[key] = value
+
+
+class Pipeline:
+    def __init__(self, write_intermediate=False, **wildcards):
+        self.scripts_dir = Path(__file__).parent.resolve()
+        self.snakemake = {
+            stage: mock_snakemake(stage, **{w: wildcards[w] for w in names})
+            for stage, names in STAGES.items()
+        }
+        # the network outputs of each stage, the inputs of the next stage
+        paths = [self.snakemake[stage].output[0] for stage in STAGES]
+        write = paths if write_intermediate else paths[-1:]
+        self.store = NetworkStore(paths, write=write)
+
+    def run(self, stages=None, config=None):
+        """
+        Runs ``stages`` in order, by default all. ``config`` updates the
+        configuration of the stages for this run only.
+        """
+        stages = list(STAGES) if stages is None else stages
+        _helpers.NETWORK_STORE = self.store
+        cwd = os.getcwd()
+        # snakemake runs the scripts from the repository root
+        os.chdir(self.scripts_dir.parent)
+        sys.path.insert(0, str(self.scripts_dir))
+        try:
+            for stage in stages:
+                snakemake = self.snakemake[stage]
+                original = snakemake.config
+                if config:
+                    snakemake.config = copy.deepcopy(original)
+                    update_config(snakemake.config, config)
+                logger.info(f"Running {stage}")
+                try:
+                    runpy.run_path(
+                        str(self.scripts_dir / f"{stage}.py"),
+                        init_globals=dict(snakemake=snakemake),
+                        run_name="__main__",
+                    )
+                finally:
+                    snakemake.config = original
+        finally:
+            sys.path.remove(str(self.scripts_dir))
+            os.chdir(cwd)
+            _helpers.NETWORK_STORE = None
+        return self.store[os.path.abspath(self.snakemake[stages[-1]].output[0])]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    wildcards = dict(arg.split("=", 1) for arg in sys.argv[1:])
+    write_intermediate = wildcards.pop("write_intermediate", "false").lower() == "true"
+    Pipeline(write_intermediate=write_intermediate, **wildcards).run()
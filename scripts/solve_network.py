@@ -5,16 +5,23 @@ Relevant Settings
 .. code:: yaml
     solving:
         tmpdir:
+        checkpoint_dir:
+        cache_dir:
         options:
             formulation:
             clip_p_max_pu:
             load_shedding:
             noisy_costs:
+            seed:
             nhours:
             min_iterations:
             max_iterations:
             skip_iterations:
             track_iterations:
+            foresight:
+            warmstart:
+            scaling:
+            reduce_generators:
         solver:
             name:
 .. seealso::
@@ -26,6 +33,8 @@ Inputs
 Outputs
 -------
 - ``results/networks/elec_s{simpl}_{clusters}_ec_l{ll}_{opts}.nc``: Solved PyPSA network including optimisation results
+- ``results/summaries/solved_{model_file}_{regions}_{resarea}_l{ll}_{opts}.parquet``: Objective, capacities, energy, emissions,
+  emission tax, curtailment, load-weighted prices and line expansion of the solved network, see :func:`_helpers.summarise_network`
     .. image:: ../img/results.png
         :scale: 40 %
 Description
@@ -48,20 +57,50 @@ Details (and errors made through this heuristic) are discussed in the paper
     since for the optimisation problem they are just a constant term (no influence on optimal result).
     Therefore, these capital costs are not included in ``network.objective``!
     If you want to calculate the full total annual system costs add these to the objective value.
+With ``foresight: myopic`` the investment periods are solved one after another. The capacities
+optimised in a period are fixed as existing capacities (keeping ``build_year`` and ``lifetime``)
+for all following periods, so each linear problem only covers the snapshots of a single period.
+With ``scaling: activate: true`` power, cost and emission quantities are rescaled (e.g. to GW, MZAR and Mt)
+before the linear problem is written to narrow the range of its coefficients. Primal and dual results are
+scaled back to MW, ZAR and t after solving.
+If ``checkpoint_dir`` is set, the network is stored after every completed iteration of the
+transmission expansion loop. An interrupted job then continues after the last stored iteration,
+provided the input network, the model file and the ``solving``, ``electricity`` and ``costs``
+settings are unchanged.
+The checkpoint is removed once the solved network has been written.
+If ``cache_dir`` is set, solved networks are stored under a fingerprint of the prepared network,
+the model file, the ``solving``, ``electricity`` and ``costs`` settings and the constraint functions
+enabled by ``opts``.
+A job with the same fingerprint copies the cached solution instead of solving again.
+Set ``seed`` to draw the same ``noisy_costs`` in every run, otherwise the fingerprint changes with the noise.
 .. tip::
     The rule :mod:`solve_all_networks` runs
     for all ``scenario`` s in the configuration file
     the rule :mod:`solve_network`.
 """
+import hashlib
+import inspect
+import json
 import logging
 import os
 import re
+import shutil
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import pypsa
-from _helpers import configure_logging, clean_pu_profiles
+import scipy.sparse as sp
+from _helpers import (
+    _stored_network,
+    configure_logging,
+    clean_pu_profiles,
+    export_network,
+    file_fingerprint,
+    load_network,
+    load_network_lazy,
+    summarise_network,
+)
 from pypsa.descriptors import get_switchable_as_dense as get_as_dense
 from pypsa.linopf import (
     define_constraints,
@@ -105,12 +144,15 @@ warnings.simplefilter(action='ignore', category=FutureWarning) # Comment out for
 logger = logging.getLogger(__name__)
 
 
-def prepare_network(n, solve_opts):
+def prepare_network(n, solve_opts, config):
     if "clip_p_max_pu" in solve_opts:
         for df in (n.generators_t.p_max_pu, n.storage_units_t.inflow):
             df.where(df > solve_opts["clip_p_max_pu"], other=0.0, inplace=True)
 
     clean_pu_profiles(n)
+    if solve_opts.get("reduce_generators"):
+        reduce_generators(n, config)
+
     load_shedding = solve_opts.get("load_shedding")
     if load_shedding:
         n.add("Carrier", "Load")
@@ -135,18 +177,20 @@ def prepare_network(n, solve_opts):
         )
 
     if solve_opts.get("noisy_costs"):
+        # a fixed seed draws the same noise in every run, so results are reproducible
+        rng = np.random.default_rng(solve_opts.get("seed"))
         for t in n.iterate_components(n.one_port_components):
             # TODO: uncomment out to and test noisy_cost (makes solution unique)
             # if 'capital_cost' in t.df:
-            #    t.df['capital_cost'] += 1e1 + 2.*(np.random.random(len(t.df)) - 0.5)
+            #    t.df['capital_cost'] += 1e1 + 2.*(rng.random(len(t.df)) - 0.5)
             if "marginal_cost" in t.df:
                 t.df["marginal_cost"] += 1e-2 + 2e-3 * (
-                    np.random.random(len(t.df)) - 0.5
+                    rng.random(len(t.df)) - 0.5
                 )
 
         for t in n.iterate_components(["Line", "Link"]):
             t.df["capital_cost"] += (
-                1e-1 + 2e-2 * (np.random.random(len(t.df)) - 0.5)
+                1e-1 + 2e-2 * (rng.random(len(t.df)) - 0.5)
             ) * t.df["length"]
 
     if solve_opts.get("nhours"):
@@ -157,6 +201,250 @@ def prepare_network(n, solve_opts):
     return n
 
 
+def reduce_generators(n, config):
+    """
+    Removes non-extendable generators which can never dispatch and aggregates
+    interchangeable non-extendable generators before solving.
+
+    Generators without capacity are removed. Generators whose ``p_max_pu`` is
+    zero in all snapshots are removed as well, unless their carrier counts
+    towards the reserve margin. Non-extendable generators with identical bus,
+    carrier, costs, efficiency, build year, lifetime, ramp limits and per unit
+    profiles are merged into the first generator of the group with the summed
+    ``p_nom``. The original generators are kept in ``n.generator_reduction``
+    and are restored by :func:`restore_generators` after solving.
+    """
+    gens = n.generators
+    fixed_b = ~gens.p_nom_extendable & ~gens.committable
+    res_margin_carriers = list(config["electricity"].get("reserve_margin", {}))
+
+    p_max_pu = get_as_dense(n, "Generator", "p_max_pu")
+    unavailable_b = (p_max_pu <= 0).all() & ~gens.carrier.isin(res_margin_carriers)
+    remove_i = gens.index[fixed_b & ((gens.p_nom == 0) | unavailable_b)]
+
+    attrs = [
+        "bus", "carrier", "sign", "marginal_cost", "capital_cost", "efficiency",
+        "p_min_pu", "p_max_pu", "build_year", "lifetime", "ramp_limit_up", "ramp_limit_down",
+    ]
+    candidates_i = gens.index[fixed_b].difference(remove_i)
+    keys = gens.loc[candidates_i, attrs].copy()
+    for attr in ["p_max_pu", "p_min_pu", "marginal_cost"]:
+        df = n.generators_t[attr]
+        cols = df.columns.intersection(candidates_i)
+        keys[attr + "_t"] = pd.util.hash_pandas_object(df[cols].T, index=False).reindex(candidates_i)
+    group = keys.groupby(list(keys.columns), dropna=False, sort=False).ngroup()
+    group = group[group.duplicated(keep=False)]
+    mapping = group.index.to_series().groupby(group).transform("first")
+
+    original_i = remove_i.union(mapping.index)
+    if original_i.empty:
+        return
+    n.generator_reduction = Dict(
+        generators=gens.loc[original_i].copy(),
+        series={
+            k: df[df.columns.intersection(original_i)].copy()
+            for k, df in n.generators_t.items() if not df.empty
+        },
+        mapping=mapping,
+    )
+
+    aggregated_p_nom = gens.p_nom[mapping.index].groupby(mapping).sum()
+    n.mremove("Generator", remove_i.union(mapping.index.difference(aggregated_p_nom.index)))
+    n.generators.loc[aggregated_p_nom.index, "p_nom"] = aggregated_p_nom
+    logger.info(
+        f"Removed {len(remove_i)} generators which cannot dispatch and aggregated "
+        f"{len(mapping)} interchangeable generators into {len(aggregated_p_nom)}."
+    )
+
+
+def restore_generators(n):
+    """
+    Restores the generators removed or aggregated by :func:`reduce_generators`
+    in the solved network. The dispatch of aggregated generators is split in
+    proportion to the ``p_nom`` of the original generators. The shadow prices
+    (``mu_*``) of an aggregated generator hold for each of the identical original
+    generators. Removed generators neither dispatch nor have binding constraints.
+    """
+    reduction = n.generator_reduction
+    generators, mapping = reduction.generators, reduction.mapping
+
+    share = generators.p_nom[mapping.index] / generators.p_nom[mapping.index].groupby(mapping).transform("sum")
+    p = n.generators_t.p[mapping.values].set_axis(mapping.index, axis=1) * share
+    mu = {
+        k: df.reindex(columns=mapping.values, fill_value=0.).set_axis(mapping.index, axis=1)
+        for k, df in n.generators_t.items() if k.startswith("mu_") and not df.empty
+    }
+
+    n.mremove("Generator", mapping.unique())
+    n.import_components_from_dataframe(generators, "Generator")
+    for attr, df in reduction.series.items():
+        n.import_series_from_dataframe(df, "Generator", attr)
+
+    n.generators.loc[generators.index, "p_nom_opt"] = generators.p_nom
+    n.generators_t.p = n.generators_t.p.reindex(columns=n.generators.index, fill_value=0.)
+    n.generators_t.p[p.columns] = p
+    for k, df in mu.items():
+        n.generators_t[k] = n.generators_t[k].reindex(columns=n.generators.index, fill_value=0.)
+        n.generators_t[k][df.columns] = df
+    del n.generator_reduction
+
+
+# unit family of the constant of each global constraint type
+GLOBAL_CONSTRAINT_UNITS = {
+    "primary_energy": "emissions",
+    "transmission_expansion_cost_limit": "cost",
+    "transmission_volume_expansion_limit": "power",
+    "tech_capacity_expansion_limit": "power",
+}
+
+
+def get_scaling(n):
+    """
+    Returns the unit scaling currently applied to the network, i.e. the factors
+    for power (MW), cost (ZAR) and emissions (t). Constants used in
+    ``extra_functionality`` have to be multiplied with these factors.
+    """
+    return getattr(n, "scaling", Dict(power=1., cost=1., emissions=1.))
+
+
+def get_unit_scaling(unit, scaling):
+    """
+    Returns the factor with which an attribute of the given pypsa unit is
+    multiplied when the network is rescaled.
+    """
+    unit = unit.strip('"')
+    if unit in ["MW", "MWh", "MVA", "MVar"]:
+        return scaling["power"]
+    if unit.startswith("currency/M"):
+        return scaling["cost"] / scaling["power"]
+    if unit == "currency":
+        return scaling["cost"]
+    if unit.startswith("tonnes/M"):
+        return scaling["emissions"] / scaling["power"]
+    return 1.
+
+
+def rescale_network(n, scaling, inverse=False):
+    """
+    Rescales all inputs and outputs of the network to the units given by
+    ``scaling`` (e.g. MW -> GW, ZAR -> MZAR, t -> Mt). Primal and dual results
+    share the unit of the attribute they are stored in, so calling the function
+    with ``inverse=True`` after solving brings both back to the original units.
+    """
+    def mul(f):
+        return 1. / f if inverse else f
+
+    for c in n.iterate_components(n.all_components - {"GlobalConstraint"}):
+        attrs = n.component_attrs[c.name]
+        for attr, unit in attrs.unit.dropna().items():
+            f = get_unit_scaling(unit, scaling)
+            if f == 1.:
+                continue
+            if attr in c.df and pd.api.types.is_numeric_dtype(c.df[attr]):
+                c.df[attr] *= mul(f)
+            if attr in c.pnl and not c.pnl[attr].empty:
+                c.pnl[attr] = c.pnl[attr] * mul(f)
+
+    # ilopf derives num_parallel of typed lines from s_nom and the nominal
+    # current, which is scaled so that sqrt(3) * i_nom * v_nom is in power units
+    n.line_types["i_nom"] *= mul(scaling["power"])
+
+    # capacities of the ilopf iterations stored by track_iterations
+    for c, attr in [("Line", "s_nom"), ("Link", "p_nom")]:
+        cols = n.df(c).columns[n.df(c).columns.str.match(attr + r"_opt_\d+$")]
+        n.df(c)[cols] *= mul(scaling["power"])
+
+    # emission attributes of carriers which are not part of the pypsa attributes
+    emissions = n.carriers.columns[
+        n.carriers.columns.str.endswith("_emissions")
+    ].difference(n.component_attrs["Carrier"].index)
+    n.carriers[emissions] *= mul(scaling["emissions"] / scaling["power"])
+
+    gc = n.global_constraints
+    f_const = gc.type.map(lambda t: scaling[GLOBAL_CONSTRAINT_UNITS[t]] if t in GLOBAL_CONSTRAINT_UNITS else 1.)
+    gc["constant"] *= f_const.map(mul)
+    # duals of the ilopf iterations stored by track_iterations
+    for col in gc.columns[gc.columns.str.match(r"mu(_\d+)?$")]:
+        gc[col] *= (scaling["cost"] / f_const).map(mul)
+
+    objectives = [a for a in n.__dict__ if re.match(r"objective_\d+$", a)]
+    for attr in ["objective", "objective_constant"] + objectives:
+        if hasattr(n, attr):
+            setattr(n, attr, getattr(n, attr) * mul(scaling["cost"]))
+
+    if inverse:
+        del n.scaling
+    else:
+        n.scaling = Dict(scaling)
+
+
+def coefficient_range(n):
+    """
+    Returns the range of absolute, non-zero coefficients in the objective
+    (costs), bounds (power and energy) and global constraints of the network.
+    """
+    values = {"objective": [], "bounds": [], "global constraints": []}
+    for c in n.iterate_components(n.all_components - {"GlobalConstraint"}):
+        attrs = n.component_attrs[c.name]
+        for attr, unit in attrs.unit.dropna().items():
+            unit = unit.strip('"')
+            if attr.endswith("_opt") or attr.startswith("mu") or attr == "marginal_price":
+                continue
+            if unit.startswith("currency"):
+                family = "objective"
+            elif unit in ["MW", "MWh", "MVA"]:
+                family = "bounds"
+            else:
+                continue
+            if attr in c.df and pd.api.types.is_numeric_dtype(c.df[attr]):
+                values[family].append(c.df[attr].values.ravel())
+            if attr in c.pnl and not c.pnl[attr].empty:
+                values[family].append(c.pnl[attr].values.ravel())
+    values["global constraints"].append(n.global_constraints.constant.values)
+
+    ranges = {}
+    for family, v in values.items():
+        v = np.abs(np.concatenate(v)) if v else np.array([])
+        v = v[np.isfinite(v) & (v > 0)]
+        if v.size:
+            ranges[family] = dict(min=v.min(), max=v.max(), log10_range=np.log10(v.max() / v.min()))
+    return pd.DataFrame(ranges).T
+
+
+def incidence_matrix(*groupers):
+    """
+    Returns a sparse matrix with a one for each element (column) in its group
+    (row) and the sorted index of the groups. Elements with a missing group
+    are left out.
+    """
+    keys = list(range(len(groupers)))
+    grouped = pd.concat(groupers, axis=1, keys=keys).groupby(keys)
+    codes = grouped.ngroup().fillna(-1).astype(int).values
+    index = grouped.size().index
+    if len(groupers) == 1:
+        index = index.get_level_values(0)
+    mask = codes >= 0
+    A = sp.csr_matrix(
+        (np.ones(mask.sum()), (codes[mask], np.flatnonzero(mask))),
+        shape=(len(index), len(codes)),
+    )
+    return A, index
+
+
+def matrix_linexpr(A, variables, index):
+    """
+    Returns the linear expressions ``A @ variables`` as a series of strings over
+    ``index``. ``variables`` are the variable references flattened in the order
+    of the columns of ``A``. This replaces ``linexpr(...).groupby(...).apply(join_exprs)``,
+    which concatenates the strings of each group separately.
+    """
+    A = sp.csr_matrix(A)
+    A.eliminate_zeros()
+    terms = linexpr((A.data, np.asarray(variables, dtype=float).ravel()[A.indices]), as_pandas=False)
+    exprs = [join_exprs(terms[i:j]) for i, j in zip(A.indptr[:-1], A.indptr[1:])]
+    return pd.Series(exprs, index=index, dtype=object)
+
+
 def add_CCL_constraints(n, sns, config):
     agg_p_nom_limits = config["electricity"].get("agg_p_nom_limits")
 
@@ -172,26 +460,17 @@ def add_CCL_constraints(n, sns, config):
         "Adding per carrier generation capacity constraints for " "individual countries"
     )
 
-    gen_country = n.generators.bus.map(n.buses.country)
+    p_nom = get_var(n, "Generator", "p_nom")
+    gens = n.generators.loc[p_nom.index]
     # cc means country and carrier
-    p_nom_per_cc = (
-        pd.DataFrame(
-            {
-                "p_nom": linexpr((1, get_var(n, "Generator", "p_nom"))),
-                "country": gen_country,
-                "carrier": n.generators.carrier,
-            }
-        )
-        .dropna(subset=["p_nom"])
-        .groupby(["country", "carrier"])
-        .p_nom.apply(join_exprs)
-    )
-    minimum = agg_p_nom_minmax["min"].dropna()
+    A, cc = incidence_matrix(gens.bus.map(n.buses.country), gens.carrier)
+    p_nom_per_cc = matrix_linexpr(A, p_nom.values, cc)
+    minimum = agg_p_nom_minmax["min"].dropna() * get_scaling(n)["power"]
     if not minimum.empty:
         minconstraint = define_constraints(
             n, p_nom_per_cc[minimum.index], ">=", minimum, "agg_p_nom", "min"
         )
-    maximum = agg_p_nom_minmax["max"].dropna()
+    maximum = agg_p_nom_minmax["max"].dropna() * get_scaling(n)["power"]
     if not maximum.empty:
         maxconstraint = define_constraints(
             n, p_nom_per_cc[maximum.index], "<=", maximum, "agg_p_nom", "max"
@@ -219,25 +498,32 @@ def add_EQ_constraints(n, sns, o, scaling=1e-1):
     )
     inflow = inflow.reindex(load.index).fillna(0.0)
     rhs = scaling * (level * load - inflow)
-    lhs_gen = (
-        linexpr(
-            (n.snapshot_weightings.generators * scaling, get_var(n, "Generator", "p").T)
-        )
-        .T.groupby(ggrouper, axis=1)
-        .apply(join_exprs)
-    )
-    lhs_spill = (
-        linexpr(
-            (
-                -n.snapshot_weightings.stores * scaling,
-                get_var(n, "StorageUnit", "spill").T,
-            )
+
+    # the variables are flattened snapshot by snapshot, so the snapshot-weighted
+    # incidence matrix is the kronecker product of the weightings and the grouping
+    p = get_var(n, "Generator", "p")
+    A_gen, groups = incidence_matrix(ggrouper.reindex(p.columns))
+    weightings = n.snapshot_weightings.generators.loc[p.index].values * scaling
+    A = sp.kron(weightings[None, :], A_gen, format="csr")
+    variables = p.values.ravel()
+
+    if not n.storage_units.empty:
+        spill = get_var(n, "StorageUnit", "spill")
+        # align the spillage groups to the generator groups, storage units
+        # in other groups are left out as before
+        codes = groups.get_indexer(sgrouper.reindex(spill.columns))
+        mask = codes >= 0
+        A_spill = sp.csr_matrix(
+            (np.ones(mask.sum()), (codes[mask], np.flatnonzero(mask))),
+            shape=(len(groups), spill.shape[1]),
         )
-        .T.groupby(sgrouper, axis=1)
-        .apply(join_exprs)
-    )
-    lhs_spill = lhs_spill.reindex(lhs_gen.index).fillna("")
-    lhs = lhs_gen + lhs_spill
+        weightings = -n.snapshot_weightings.stores.loc[spill.index].values * scaling
+        A = sp.hstack([A, sp.kron(weightings[None, :], A_spill)], format="csr")
+        variables = np.concatenate([variables, spill.values.ravel()])
+
+    lhs = matrix_linexpr(A, variables, groups)
+    # write_constraint does not align, groups without load have a zero minimum
+    rhs = rhs.reindex(groups, fill_value=0.0)
     define_constraints(n, lhs, ">=", rhs, "equity", "min")
 
 def min_capacity_factor(n,sns):
@@ -270,7 +556,10 @@ def reserves(n, sns):
         carriers = snakemake.config["electricity"]["operating_reserves"][reserve_type]
         for y in n.snapshots.get_level_values(0).unique():
             lhs=0
-            rhs = reserve_requirements.loc[(model_setup['projected_parameters'],reserve_type+'_reserves'),y]
+            rhs = (
+                reserve_requirements.loc[(model_setup['projected_parameters'],reserve_type+'_reserves'),y]
+                * get_scaling(n)["power"]
+            )
 
             # Generators
             for tech_type in ['Generator','StorageUnit']:
@@ -362,55 +651,51 @@ def define_storage_global_constraints(n, sns):
         capacities of extendable generators have to be below the set limit.
     """
 
-    if n._multi_invest:
-        period_weighting = n.investment_period_weightings["years"]
-        weightings = n.snapshot_weightings.mul(period_weighting, level=0, axis=0).loc[
-            sns
-        ]
-    else:
-        weightings = n.snapshot_weightings.loc[sns]
-
-    def get_period(n, glc, sns):
-        period = slice(None)
-        if n._multi_invest and not np.isnan(glc["investment_period"]):
-            period = int(glc["investment_period"])
-            if period not in sns.unique("period"):
-                logger.warning(
-                    "Optimized snapshots do not contain the investment "
-                    f"period required for global constraint `{glc.name}`."
-                )
-        return period
-
-
     # (4) tech_capacity_expansion_limit
     # TODO: Generalize to carrier capacity expansion limit (i.e. also for stores etc.)
-    #substr = lambda s: re.sub(r"[\[\]\(\)]", "", s)
     glcs = n.global_constraints.query("type == " '"tech_capacity_expansion_limit"')
     c, attr = "StorageUnit", "p_nom"
+    if glcs.empty or not n.df(c)["p_nom_extendable"].any():
+        return
 
-    for name, glc in glcs.iterrows():
-        period = get_period(n, glc, sns)
-        car = glc["carrier_attribute"]
-        bus = str(glc.get("bus", ""))  # in pypsa buses are always strings
-        ext_i = n.df(c).query("carrier == @car and p_nom_extendable").index
-        if bus:
-            ext_i = n.df(c).loc[ext_i].query("bus == @bus").index
-        ext_i = ext_i[get_activity_mask(n, c, sns)[ext_i].loc[period].any()]
+    cap_vars = get_var(n, c, attr)
+    ext = n.df(c).loc[cap_vars.index]
 
-        if ext_i.empty:
-            continue
+    # glc x asset matrices of matching carrier, bus (in pypsa buses are always strings)
+    # and activity in the investment period of the constraint
+    carrier = glcs["carrier_attribute"].values[:, None] == ext["carrier"].values
+    bus = glcs.get("bus", pd.Series("", glcs.index)).fillna("").astype(str).values[:, None]
+    bus = (bus == "") | (bus == ext["bus"].values)
 
-        cap_vars = get_var(n, c, attr)[ext_i]
+    active = get_activity_mask(n, c, sns)[ext.index]
+    active_any = np.broadcast_to(active.any().values, (len(glcs), len(ext)))
+    if n._multi_invest:
+        periods = glcs["investment_period"].astype(float)
+        active_per_period = active.groupby(level=0).any()
+        missing = periods.dropna()[~periods.dropna().isin(active_per_period.index)]
+        for name in missing.index:
+            logger.warning(
+                "Optimized snapshots do not contain the investment "
+                f"period required for global constraint `{name}`."
+            )
+        active_glc = active_per_period.reindex(periods.values).fillna(False).astype(bool).values
+        active = np.where(periods.isna().values[:, None], active_any, active_glc)
+    else:
+        active = active_any
 
-        lhs = join_exprs(linexpr((1, cap_vars)))
-        rhs = glc.constant
-        sense = glc.sense
+    A = sp.csr_matrix(carrier & bus & active)
+    keep = A.getnnz(axis=1) > 0
+    if not keep.any():
+        return
 
+    lhs = matrix_linexpr(A[keep], cap_vars.values, glcs.index[keep])
+    # one constraint per global constraint, so that each keeps its name and sense
+    for name, glc in glcs[keep].iterrows():
         define_constraints(
             n,
-            lhs,
-            sense,
-            rhs,
+            lhs[name],
+            glc.sense,
+            glc.constant,
             "GlobalConstraint",
             "mu",
             axes=pd.Index([name]),
@@ -452,7 +737,7 @@ def add_local_max_capacity_constraint(n,snapshots):
 # add_BAU_constraints, add_SAFE_constraint, add_operational_reserve_margin_constraint
 # line 473 - 530 -> otherwise functions not defined
 def add_BAU_constraints(n, config):
-    mincaps = pd.Series(config["electricity"]["BAU_mincapacities"])
+    mincaps = pd.Series(config["electricity"]["BAU_mincapacities"]) * get_scaling(n)["power"]
     lhs = (
         linexpr((1, get_var(n, "Generator", "p_nom")))
         .groupby(n.generators.carrier)
@@ -477,7 +762,7 @@ def add_operational_reserve_margin_constraint(n, config):
     reserve_config = config["electricity"]["operational_reserve"]
     EPSILON_LOAD = reserve_config["epsilon_load"]
     EPSILON_VRES = reserve_config["epsilon_vres"]
-    CONTINGENCY = reserve_config["contingency"]
+    CONTINGENCY = reserve_config["contingency"] * get_scaling(n)["power"]
 
     # Reserve Variables
     reserve = get_var(n, "Generator", "r")
@@ -517,8 +802,11 @@ def add_emission_prices(n, emission_prices=None, exclude_co2=False):
         emission_prices = snakemake.config['costs']['emission_prices']
     if exclude_co2:
         emission_prices.pop('co2')
-    
-    ep = (pd.Series(emission_prices).rename(lambda x: x+'_emissions') * n.carriers).sum(axis=1)
+
+    # emission prices in ZAR/t, scaled to the units of the network while solving
+    scaling = get_scaling(n)
+    emission_prices = pd.Series(emission_prices) * scaling["cost"] / scaling["emissions"]
+    ep = (emission_prices.rename(lambda x: x+'_emissions') * n.carriers).sum(axis=1)
     n.generators['marginal_cost'] += n.generators.carrier.map(ep)
     n.storage_units['marginal_cost'] += n.storage_units.carrier.map(ep)
 
@@ -549,18 +837,21 @@ def add_carbontax_constraints(n, year=2030, additional_investment=0, base_invest
     renewable_carriers = ['onwind', 'solar']
 
     add_generators = n.generators[(n.generators['carrier'].isin(renewable_carriers)) & (n.generators.build_year == year)]
-    add_generators['investment_cost'] = add_generators['carrier'].map(invest_dict) * 1000
+    scaling = get_scaling(n)
+    add_generators['investment_cost'] = (
+        add_generators['carrier'].map(invest_dict) * 1000 * scaling["cost"] / scaling["power"]
+    )
 
     if add_generators.empty or ('Generator', 'p_nom') not in n.variables.index:
         return
 
     generators_p_nom = get_var(n, "Generator", "p_nom")
     lhs = linexpr((add_generators['investment_cost'], generators_p_nom[add_generators.index])).sum()
-    total_investment = base_investment + additional_investment
+    total_investment = (base_investment + additional_investment) * scaling["cost"]
 
     define_constraints(n, lhs, ">=", total_investment, 'Generator-Storage', 'additional_carbontax_investment')
 
-def reinvest_carbon_taxes(n, config, opts, base_investment):
+def reinvest_carbon_taxes(n, config, opts, base_investment, initial_carbon_taxes=0):
     tolerance = 0.000001  # Lower tolerance for more iterations
     iteration = 0
     df_iterations = pd.DataFrame(columns=["iteration", "emissions_mt", "carbon_taxes_musd"])
@@ -647,23 +938,8 @@ def extra_functionality(n, snapshots, additional_investment=0, base_investment=0
     If you want to enforce additional custom constraints, this is a good location to add them.
     The arguments ``opts`` and ``snakemake.config`` are expected to be attached to the network.
     """
-    opts = n.opts
-    config = n.config
-    if "BAU" in opts and n.generators.p_nom_extendable.any():
-        add_BAU_constraints(n, snapshots, config)
-    if "SAFE" in opts and n.generators.p_nom_extendable.any():
-        add_SAFE_constraints(n, snapshots, config)
-    if "CCL" in opts and n.generators.p_nom_extendable.any():
-        add_CCL_constraints(n, snapshots,config)
-    reserve = config["electricity"].get("operational_reserve", {})
-    if reserve.get("activate"):
-        add_operational_reserve_margin_constraint(n, snapshots, config) #added _constraint
-    for o in opts:
-        if "EQ" in o:
-            add_EQ_constraints(n, snapshots, o)
-    min_capacity_factor(n,snapshots)
-    define_storage_global_constraints(n, snapshots)
-    reserves(n,snapshots)
+    for func, args in enabled_constraints(n, snapshots, n.opts, n.config):
+        func(*args)
     # added AM constraints
     ##add_carbontax_contraints1(n)
     ##add_carbon_taxes(n)
@@ -671,12 +947,275 @@ def extra_functionality(n, snapshots, additional_investment=0, base_investment=0
     #add_carbontax_constraints(n, year=2030, additional_investment=additional_investment,base_investment=base_investment)
     #add_emission_prices(n)
     ##
-    emission_prices_scenario(n, snapshots)
     #one_year_reinvestment_scenario(n, snapshots, additional_investment=additional_investment, base_investment=base_investment)
     #full_reinvestment_loop_scenario(n, config, opts, base_investment)
 
 
-def solve_network(n, config, opts="",additional_investment=0, base_investment=0, iteration=0, **kwargs):
+def enabled_constraints(n, snapshots, opts, config):
+    """
+    Returns the constraint functions which :func:`extra_functionality` adds for
+    ``opts`` and ``config``, each with the arguments it is called with.
+    """
+    constraints = []
+    if n.generators.p_nom_extendable.any():
+        if "BAU" in opts:
+            constraints.append((add_BAU_constraints, (n, config)))
+        if "SAFE" in opts:
+            constraints.append((add_SAFE_constraints, (n, config)))
+        if "CCL" in opts:
+            constraints.append((add_CCL_constraints, (n, snapshots, config)))
+    reserve = config["electricity"].get("operational_reserve", {})
+    if reserve.get("activate"):
+        constraints.append((add_operational_reserve_margin_constraint, (n, config)))
+    for o in opts:
+        if "EQ" in o:
+            constraints.append((add_EQ_constraints, (n, snapshots, o)))
+    for func in [min_capacity_factor, define_storage_global_constraints, reserves, emission_prices_scenario]:
+        constraints.append((func, (n, snapshots)))
+    return constraints
+
+
+def network_fingerprint(n, config, opts, model_fn=None, **extra):
+    """
+    Returns a hash of the network content, the solving, electricity and costs
+    settings, the content of the model file ``model_fn`` read by :func:`reserves`,
+    the pypsa version and the whole source of ``solve_network.py`` and
+    ``_helpers.py``. Identical fingerprints lead to identical optimisation problems.
+    """
+    h = hashlib.sha256()
+
+    def update(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+            h.update(pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index)).values.tobytes())
+            h.update(repr(list(getattr(obj, "columns", []))).encode())
+        else:
+            h.update(json.dumps(obj, sort_keys=True, default=str).encode())
+
+    update(n.snapshots.to_frame(index=False))
+    update(n.snapshot_weightings)
+    update(n.investment_period_weightings)
+    for c in n.iterate_components():
+        h.update(c.name.encode())
+        update(c.df)
+        for attr, df in c.pnl.items():
+            if not df.empty:
+                h.update(attr.encode())
+                update(df)
+
+    update([config["solving"], config["electricity"], config["costs"], opts, extra])
+    if model_fn is not None:
+        h.update(Path(model_fn).read_bytes())
+
+    # under snakemake this module runs from a copy, the scripts sit next to _helpers
+    scripts = Path(inspect.getfile(file_fingerprint)).parent
+    for fn in ["solve_network.py", "_helpers.py"]:
+        h.update((scripts / fn).read_bytes())
+    h.update(pypsa.__version__.encode())
+    return h.hexdigest()
+
+
+def get_checkpoint(checkpoint_dir, name, key):
+    """
+    Returns the checkpoint stored in ``checkpoint_dir/name``. The ``key`` identifies
+    the input network and solver settings, a checkpoint written for a different
+    key is discarded.
+    """
+    path = Path(checkpoint_dir) / name
+    state = {}
+    state_fn = path / "state.json"
+    if state_fn.exists():
+        state = json.loads(state_fn.read_text())
+        if state.get("key") != key:
+            logger.info(f"Discarding checkpoint in {path} written for different inputs")
+            shutil.rmtree(path)
+            state = {}
+    return Dict(path=path, key=key, state=state)
+
+
+def get_checkpoint_key(fns, config, opts):
+    """
+    Returns a key of the input files (network and model file) and of the
+    solving, electricity and costs configuration. Networks held in memory by
+    ``run_pipeline`` are keyed on their content, their files may not exist.
+    """
+
+    def fingerprint(fn):
+        n = _stored_network(fn, copy=False)
+        return file_fingerprint(fn) if n is None else network_fingerprint(n, config, opts)
+
+    content = json.dumps(
+        [
+            [fingerprint(fn) for fn in fns],
+            config["solving"],
+            config["electricity"],
+            config["costs"],
+            opts,
+        ],
+        sort_keys=True, default=str,
+    )
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def save_checkpoint(n, checkpoint, stage, iteration, **state):
+    """
+    Stores the network and the outer loop bookkeeping after a completed
+    iteration. The state file is replaced only after the network is written,
+    so an interrupted write leaves the previous checkpoint intact.
+    """
+    path = checkpoint.path
+    path.mkdir(parents=True, exist_ok=True)
+    network_fn = f"network_{stage}_{iteration}.nc"
+    # written losslessly, a resumed run has to solve exactly the same network
+    n.export_to_netcdf(path / network_fn)
+    if hasattr(n, "generator_reduction") and not (path / "generator_reduction.pkl").exists():
+        pd.to_pickle(n.generator_reduction, path / "generator_reduction.pkl")
+
+    previous_fn = checkpoint.state.get("network")
+    checkpoint.state = dict(
+        state,
+        key=checkpoint.key,
+        stage=stage,
+        iteration=iteration,
+        network=network_fn,
+        scaling=dict(n.scaling) if hasattr(n, "scaling") else None,
+        basis_fn=getattr(n, "basis_fn", None),
+    )
+    (path / "state.tmp.json").write_text(json.dumps(checkpoint.state, default=float))
+    os.replace(path / "state.tmp.json", path / "state.json")
+    if previous_fn is not None and previous_fn != network_fn:
+        (path / previous_fn).unlink(missing_ok=True)
+    logger.info(f"Stored checkpoint of {stage} iteration {iteration} in {path}")
+
+
+def load_checkpoint(checkpoint):
+    """
+    Returns the network of the last completed iteration in the original units.
+    """
+    state = checkpoint.state
+    logger.info(f"Resuming from checkpoint of {state['stage']} iteration {state['iteration']}")
+    n = pypsa.Network(str(checkpoint.path / state["network"]))
+    if state.get("scaling"):
+        n.scaling = Dict(state["scaling"])
+        rescale_network(n, n.scaling, inverse=True)
+    if (checkpoint.path / "generator_reduction.pkl").exists():
+        n.generator_reduction = pd.read_pickle(checkpoint.path / "generator_reduction.pkl")
+    return n
+
+
+def ilopf_with_checkpoints(
+    n,
+    checkpoint,
+    msq_threshold=0.05,
+    min_iterations=1,
+    max_iterations=100,
+    track_iterations=False,
+    **kwargs,
+):
+    """
+    Variant of :func:`pypsa.linopf.ilopf` which stores a checkpoint after each
+    iteration and continues after the last completed iteration of ``checkpoint``.
+    With ``track_iterations`` the capacities, status, objective and global
+    constraint duals of each iteration are kept as in :func:`pypsa.linopf.ilopf`.
+    """
+    ext_i = get_extendable_i(n, "Line")
+    typed_i = n.lines.query('type != ""').index
+    ext_untyped_i = ext_i.difference(typed_i)
+    ext_typed_i = ext_i.intersection(typed_i)
+    base_s_nom = (
+        np.sqrt(3)
+        * n.lines["type"].map(n.line_types.i_nom)
+        * n.lines.bus0.map(n.buses.v_nom)
+    )
+
+    state = checkpoint.state if checkpoint.state.get("stage") == "ilopf" else {}
+    iteration = state.get("iteration", 0) + 1
+    diff = state.get("diff", msq_threshold)
+    tracked = state.get("tracked", {})
+    if iteration == 1:
+        n.lines["carrier"] = n.lines.bus0.map(n.buses.carrier)
+        n.lines.loc[ext_typed_i, "num_parallel"] = (n.lines.s_nom / base_s_nom)[ext_typed_i]
+        if track_iterations:
+            for c, attr in pd.Series(nominal_attrs)[n.branch_components].items():
+                n.df(c)[f"{attr}_opt_0"] = n.df(c)[f"{attr}"]
+    else:
+        for name, value in tracked.items():
+            setattr(n, name, value)
+        if state.get("basis_fn") and os.path.exists(state["basis_fn"]):
+            n.basis_fn = state["basis_fn"]
+
+    kwargs["store_basis"] = True
+    while diff >= msq_threshold or iteration < min_iterations:
+        if iteration > max_iterations:
+            logger.info(
+                f"Iteration {iteration} beyond max_iterations "
+                f"{max_iterations}. Stopping ..."
+            )
+            break
+
+        s_nom_prev = n.lines.s_nom_opt.copy()
+        kwargs["warmstart"] = "basis_fn" in n.__dir__()
+        status, termination_condition = network_lopf(n, **kwargs)
+        assert status == "ok", (
+            f"Optimization failed with status {status}"
+            f"and termination {termination_condition}"
+        )
+        if track_iterations:
+            for c, attr in pd.Series(nominal_attrs)[n.branch_components].items():
+                n.df(c)[f"{attr}_opt_{iteration}"] = n.df(c)[f"{attr}_opt"]
+            tracked.update({
+                f"status_{iteration}": status,
+                f"objective_{iteration}": n.objective,
+                "iteration": iteration,
+            })
+            for name, value in tracked.items():
+                setattr(n, name, value)
+            n.global_constraints = n.global_constraints.rename(
+                columns={"mu": f"mu_{iteration}"}
+            )
+
+        factor = n.lines.s_nom_opt / s_nom_prev
+        for attr, carrier in (("x", "AC"), ("r", "DC")):
+            ln_i = n.lines.query("carrier == @carrier").index.intersection(ext_untyped_i)
+            n.lines.loc[ln_i, attr] /= factor[ln_i]
+        n.lines.loc[ext_typed_i, "num_parallel"] = (n.lines.s_nom_opt / base_s_nom)[ext_typed_i]
+
+        diff = (
+            np.sqrt((s_nom_prev - n.lines.s_nom_opt).pow(2).mean())
+            / n.lines["s_nom_opt"].mean()
+        )
+        logger.info(f"Mean square difference after iteration {iteration} is {diff}")
+        save_checkpoint(n, checkpoint, "ilopf", iteration, diff=diff, tracked=tracked)
+        iteration += 1
+
+    logger.info("Running last lopf with fixed branches (HVDC links and HVAC lines)")
+    ext_dc_links_b = n.links.p_nom_extendable & (n.links.carrier == "DC")
+    s_nom_orig = n.lines.s_nom.copy()
+    p_nom_orig = n.links.p_nom.copy()
+    n.lines.loc[ext_i, ["s_nom", "s_nom_extendable"]] = (
+        n.lines.loc[ext_i, "s_nom_opt"],
+        False,
+    )
+    n.links.loc[ext_dc_links_b, ["p_nom", "p_nom_extendable"]] = (
+        n.links.loc[ext_dc_links_b, "p_nom_opt"],
+        False,
+    )
+    kwargs["warmstart"] = False
+    network_lopf(n, **kwargs)
+    n.lines.loc[ext_i, ["s_nom", "s_nom_extendable"]] = s_nom_orig.loc[ext_i], True
+    n.links.loc[ext_dc_links_b, ["p_nom", "p_nom_extendable"]] = (
+        p_nom_orig.loc[ext_dc_links_b],
+        True,
+    )
+    # add costs of additional infrastructure to objective value of last iteration
+    obj_links = (
+        n.links[ext_dc_links_b].eval("capital_cost * (p_nom_opt - p_nom_min)").sum()
+    )
+    obj_lines = n.lines.eval("capital_cost * (s_nom_opt - s_nom_min)").sum()
+    n.objective += obj_links + obj_lines
+    n.objective_constant -= obj_links + obj_lines
+
+
+def solve_network(n, config, opts="",additional_investment=0, base_investment=0, iteration=0, checkpoint=None, **kwargs):
     solver_options = config["solving"]["solver"].copy()
     solver_name = solver_options.pop("name")
     cf_solving = config["solving"]["options"]
@@ -684,8 +1223,8 @@ def solve_network(n, config, opts="",additional_investment=0, base_investment=0,
     min_iterations = cf_solving.get("min_iterations", 4)
     max_iterations = cf_solving.get("max_iterations", 6)
 
-    multi_investment_periods=isinstance(n.snapshots, pd.MultiIndex)
-    multi_investment_periods=False
+    # activity masks from build_year/lifetime are only needed when solving period by period
+    multi_investment_periods=cf_solving.get("foresight", "perfect") == "myopic"
 
     #  only consider investments until 2030
     # wished_sn = n.snapshots[n.snapshots.get_level_values(0)<=2030]
@@ -695,12 +1234,14 @@ def solve_network(n, config, opts="",additional_investment=0, base_investment=0,
     constraint_name = "CO2Limit2030"
     if constraint_name in n.global_constraints.index:
         n.global_constraints.drop(constraint_name, inplace=True)
-    n.add("GlobalConstraint",
-          constraint_name,
-          carrier_attribute="co2_emissions",
-          sense="<=",
-          investment_period=2030,
-          constant=275e6) #max CO2 2030 100e6, IRP 2030 275e6
+    # networks of a single myopic period only carry the limit of their own period
+    if n.investment_periods.empty or 2030 in n.investment_periods:
+        n.add("GlobalConstraint",
+              constraint_name,
+              carrier_attribute="co2_emissions",
+              sense="<=",
+              investment_period=2030,
+              constant=275e6) #max CO2 2030 100e6, IRP 2030 275e6
 
     # n.add("GlobalConstraint",
     #       "CO2Limit2030",
@@ -714,27 +1255,51 @@ def solve_network(n, config, opts="",additional_investment=0, base_investment=0,
     n.config = config
     n.opts = opts
 
-    if (snakemake.wildcards.regions=='RSA') | (cf_solving.get("skip_iterations", False)):
-        network_lopf(
-            n,
-            solver_name=solver_name,
-            solver_options=solver_options,
-            multi_investment_periods=multi_investment_periods,
-            extra_functionality=extra_functionality,
-            **kwargs
-        )
-    else:
-        ilopf(
-            n,
-            solver_name=solver_name,
-            solver_options=solver_options,
-            track_iterations=track_iterations,
-            min_iterations=min_iterations,
-            max_iterations=max_iterations,
-            multi_investment_periods=multi_investment_periods,
-            extra_functionality=extra_functionality,
-            **kwargs
-        )
+    scaling = cf_solving.get("scaling", {})
+    if scaling.get("activate", False):
+        scaling = {k: float(scaling.get(k, 1.)) for k in ["power", "cost", "emissions"]}
+        logger.info(f"Coefficient ranges before scaling:\n{coefficient_range(n)}")
+        rescale_network(n, scaling)
+        logger.info(f"Coefficient ranges after scaling {scaling}:\n{coefficient_range(n)}")
+
+    try:
+        if (snakemake.wildcards.regions=='RSA') | (cf_solving.get("skip_iterations", False)):
+            network_lopf(
+                n,
+                solver_name=solver_name,
+                solver_options=solver_options,
+                multi_investment_periods=multi_investment_periods,
+                extra_functionality=extra_functionality,
+                **kwargs
+            )
+        elif checkpoint is not None:
+            ilopf_with_checkpoints(
+                n,
+                checkpoint,
+                solver_name=solver_name,
+                solver_options=solver_options,
+                track_iterations=track_iterations,
+                min_iterations=min_iterations,
+                max_iterations=max_iterations,
+                multi_investment_periods=multi_investment_periods,
+                extra_functionality=extra_functionality,
+                **kwargs
+            )
+        else:
+            ilopf(
+                n,
+                solver_name=solver_name,
+                solver_options=solver_options,
+                track_iterations=track_iterations,
+                min_iterations=min_iterations,
+                max_iterations=max_iterations,
+                multi_investment_periods=multi_investment_periods,
+                extra_functionality=extra_functionality,
+                **kwargs
+            )
+    finally:
+        if hasattr(n, "scaling"):
+            rescale_network(n, n.scaling, inverse=True)
 
     # Calculate and print emissions and carbon taxes after solving the network - Agatha
     #calculate_and_print_emissions_and_taxes(n)
@@ -758,6 +1323,117 @@ def solve_network(n, config, opts="",additional_investment=0, base_investment=0,
     #return n
 
 
+def get_period_network(n, period):
+    """
+    Returns a copy of the network restricted to the snapshots of a single
+    investment period. Global constraints tied to other investment periods
+    are dropped, constraints without an investment period are kept.
+    """
+    snapshots = n.snapshots[n.snapshots.get_level_values(0) == period].remove_unused_levels()
+
+    m = n.copy(with_time=False)
+    m.set_snapshots(snapshots)
+    m.set_investment_periods([period])
+    m.investment_period_weightings = n.investment_period_weightings.loc[[period]]
+    m.snapshot_weightings = n.snapshot_weightings.loc[snapshots]
+    for c in n.iterate_components():
+        pnl = m.pnl(c.name)
+        for k, df in c.pnl.items():
+            pnl[k] = df.loc[snapshots].copy()
+
+    gc_period = m.global_constraints.investment_period
+    m.mremove(
+        "GlobalConstraint",
+        m.global_constraints.index[gc_period.notna() & (gc_period != period)]
+    )
+    return m
+
+
+def carry_forward_capacities(n, m, period):
+    """
+    Fixes the capacities built up to ``period`` in the solved period network ``m``
+    as existing capacities in ``n``. Extendable generators, storage units and
+    stores with ``build_year <= period`` become non-extendable with ``p_nom``
+    (``e_nom``) set to the optimised value, their ``build_year`` and ``lifetime``
+    are kept so that they retire in later periods. Transmission expansion is
+    carried forward as a lower bound on the extendable branch capacity.
+    """
+    for c, attr in [("Generator", "p_nom"), ("StorageUnit", "p_nom"), ("Store", "e_nom")]:
+        df = m.df(c)
+        ext_i = df.index[df[attr + "_extendable"] & (df.build_year <= period)]
+        n.df(c).loc[ext_i, attr] = df.loc[ext_i, attr + "_opt"]
+        n.df(c).loc[ext_i, attr + "_extendable"] = False
+
+    for c, attr in [("Line", "s_nom"), ("Link", "p_nom")]:
+        df = m.df(c)
+        ext_i = df.index[df[attr + "_extendable"]]
+        n.df(c).loc[ext_i, attr + "_min"] = df.loc[ext_i, attr + "_opt"]
+
+
+def store_period_results(n, m):
+    """
+    Copies the optimisation results of the period network ``m`` back into ``n``.
+    """
+    for c in m.iterate_components():
+        attrs = n.component_attrs[c.name]
+        pnl = n.pnl(c.name)
+        for k, df in c.pnl.items():
+            if df.empty or not attrs.at[k, "status"].startswith("Output"):
+                continue
+            pnl[k] = pnl[k].reindex(columns=pnl[k].columns.union(df.columns))
+            pnl[k].loc[df.index, df.columns] = df
+
+        outputs = attrs.index[(attrs.type != "series") & attrs.status.str.startswith("Output")]
+        outputs = outputs.intersection(c.df.columns)
+        index = c.df.index.intersection(n.df(c.name).index)
+        n.df(c.name).loc[index, outputs] = c.df.loc[index, outputs]
+
+
+def solve_network_myopic(n, config, opts="", **kwargs):
+    """
+    Solves the investment periods of ``n`` in sequence with myopic foresight.
+
+    Each period is optimised on its own snapshots, the capacities built in that
+    period are carried forward as existing capacities (with their ``build_year``
+    and ``lifetime``) before the next period is solved. If ``warmstart`` is
+    enabled in ``config["solving"]["options"]`` the basis of the previous
+    period is handed to the solver for the next one. The basis is set as
+    ``basis_fn`` of the period network, which the iterative solves of
+    :func:`pypsa.linopf.ilopf` and :func:`ilopf_with_checkpoints` use for
+    their first iteration.
+    """
+    cf_solving = config["solving"]["options"]
+    warmstart = cf_solving.get("warmstart", False)
+
+    n.objective = 0.
+    basis_fn = None
+    summary = {}
+    for period in n.investment_periods:
+        logger.info(f"Solving investment period {period} with myopic foresight")
+        m = get_period_network(n, period)
+
+        if warmstart:
+            kwargs["store_basis"] = True
+            # ilopf overwrites the warmstart argument, but starts from m.basis_fn
+            kwargs["warmstart"] = basis_fn is not None and os.path.exists(basis_fn)
+            if kwargs["warmstart"]:
+                m.basis_fn = basis_fn
+
+        m, emissions, carbon_taxes, _ = solve_network(m, config=config, opts=opts, **kwargs)
+        basis_fn = getattr(m, "basis_fn", None)
+
+        store_period_results(n, m)
+        carry_forward_capacities(n, m, period)
+        n.objective += m.objective
+        summary[period] = dict(emissions_mt=emissions, carbon_taxes_mzar=carbon_taxes)
+
+    n.config = config
+    n.opts = opts
+    logger.info(f"Myopic emissions and carbon taxes per period:\n{pd.DataFrame(summary).T}")
+
+    return n
+
+
 
 #%%
 if __name__ == "__main__":
@@ -785,16 +1461,51 @@ if __name__ == "__main__":
     opts = snakemake.wildcards.opts.split("-")
     solve_opts = snakemake.config["solving"]["options"]
 
+    myopic = solve_opts.get("foresight", "perfect") == "myopic"
+    checkpoint = None
+    checkpoint_dir = snakemake.config["solving"].get("checkpoint_dir")
+    if checkpoint_dir is not None and not myopic:
+        checkpoint = get_checkpoint(
+            checkpoint_dir,
+            Path(snakemake.output[0]).stem,
+            get_checkpoint_key(
+                [snakemake.input[0], snakemake.input.model_file], snakemake.config, opts
+            ),
+        )
+
     fn = getattr(snakemake.log, "memory", None)
     with memory_logger(filename=fn, interval=30.0) as mem:
-        n = pypsa.Network(snakemake.input[0])
-        n.set_snapshots(n.snapshots[n.snapshots.get_level_values(0)==2030])
-        n.global_constraints = n.global_constraints[n.global_constraints.index.str.contains("2030")]
-        if snakemake.config["augmented_line_connection"].get("add_to_snakefile"):
-            n.lines.loc[
-                n.lines.index.str.contains("new"), "s_nom_min"
-            ] = snakemake.config["augmented_line_connection"].get("min_expansion")
-        n = prepare_network(n, solve_opts)
+        if checkpoint is not None and checkpoint.state:
+            n = load_checkpoint(checkpoint)
+        else:
+            if myopic:
+                n = load_network(snakemake.input[0])
+            else:
+                # only read the snapshots of 2030 from disk
+                n = load_network_lazy(snakemake.input[0], periods=[2030])
+                n.global_constraints = n.global_constraints[n.global_constraints.index.str.contains("2030")]
+            if snakemake.config["augmented_line_connection"].get("add_to_snakefile"):
+                n.lines.loc[
+                    n.lines.index.str.contains("new"), "s_nom_min"
+                ] = snakemake.config["augmented_line_connection"].get("min_expansion")
+            n = prepare_network(n, solve_opts, snakemake.config)
+
+        cache_fn = None
+        cache_dir = snakemake.config["solving"].get("cache_dir")
+        # a network resumed from a checkpoint is partially solved and has no fingerprint
+        if cache_dir is not None and not (checkpoint is not None and checkpoint.state):
+            fingerprint = network_fingerprint(
+                n,
+                snakemake.config,
+                opts,
+                model_fn=snakemake.input.model_file,
+                regions=snakemake.wildcards.regions,
+                model_file=snakemake.wildcards.model_file,
+            )
+            cache_fn = Path(cache_dir) / f"{fingerprint}.nc"
+            logger.info(f"Fingerprint of the prepared network is {fingerprint}")
+
+        cached = cache_fn is not None and cache_fn.exists()
 
 # NORMAL RUN - COMMENT REINVESTMENT RUN
         # n = solve_network(
@@ -808,13 +1519,26 @@ if __name__ == "__main__":
 #
 
     # Emission prices run!
-        n, emissions, carbon_taxes, base_investment = solve_network(
-            n,
-            config=snakemake.config,
-            opts=opts,
-            solver_dir=tmpdir,
-            solver_logfile=snakemake.log.solver,
-        )
+        if cached:
+            logger.info(f"Reusing cached solution {cache_fn}")
+            n = pypsa.Network(str(cache_fn))
+        elif myopic:
+            n = solve_network_myopic(
+                n,
+                config=snakemake.config,
+                opts=opts,
+                solver_dir=tmpdir,
+                solver_logfile=snakemake.log.solver,
+            )
+        else:
+            n, emissions, carbon_taxes, base_investment = solve_network(
+                n,
+                config=snakemake.config,
+                opts=opts,
+                checkpoint=checkpoint,
+                solver_dir=tmpdir,
+                solver_logfile=snakemake.log.solver,
+            )
 
 # # REINVESTMENT RUN - COMMENT NORMAL RUN
 #         # add base investment and pass to reinvest_carbon_taxes - added AM
@@ -830,8 +1554,27 @@ if __name__ == "__main__":
 #         one_year_reinvestment_scenario(n, n.snapshots, additional_investment=carbon_taxes, base_investment=base_investment)
 
         # Run the reinvestment loop with the calculated base investment
-        #n = reinvest_carbon_taxes(n, snakemake.config, opts, base_investment)
+        #n = reinvest_carbon_taxes(n, snakemake.config, opts, base_investment, carbon_taxes)
 #
 
-        n.export_to_netcdf(snakemake.output[0])
+        if hasattr(n, "generator_reduction"):
+            restore_generators(n)
+
+        export_network(n, snakemake.output[0], snakemake.config.get("export"))
+
+        # small sidecar of the key results for comparisons across scenarios
+        summary = summarise_network(
+            n,
+            snakemake.config["costs"].get("emission_prices"),
+            renewable_carriers=list(snakemake.config["renewable"]),
+        )
+        for key, value in snakemake.wildcards.items():
+            summary[key] = value
+        summary.to_parquet(snakemake.output.summary, index=False)
+        if cache_fn is not None and not cached:
+            cache_fn.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(snakemake.output[0], cache_fn.with_suffix(".tmp"))
+            os.replace(cache_fn.with_suffix(".tmp"), cache_fn)
+        if checkpoint is not None and checkpoint.path.exists():
+            shutil.rmtree(checkpoint.path)
     logger.info("Maximum memory usage: {}".format(mem.mem_usage))
\ No newline at end of file
@@ -0,0 +1,17 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# the scripts import each other as top-level modules, as under snakemake
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+
+requires_cbc = pytest.mark.skipif(
+    shutil.which("cbc") is None, reason="requires the cbc solver on the PATH"
+)
@@ -0,0 +1,27 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import geopandas as gpd
+import numpy as np
+import rasterio as rio
+from build_natura_raster import rasterize_tiled
+from rasterio.features import rasterize
+from rasterio.transform import from_origin
+from shapely.geometry import Point, box
+
+
+def test_rasterize_tiled_matches_rasterize(tmp_path):
+    shapes = gpd.GeoSeries(
+        [box(10, 10, 250, 60), Point(150, 150).buffer(70), box(280, 5, 295, 295)],
+        crs=3035,
+    )
+    transform, out_shape = from_origin(0, 300, 1, 1), (300, 300)
+    fn = tmp_path / "natura.tiff"
+
+    rasterize_tiled(shapes, transform, out_shape, fn, nprocesses=2, tile=64)
+
+    with rio.open(fn) as src:
+        raster = src.read(1)
+    expected = rasterize(shapes, out_shape, transform=transform, dtype=rio.uint8)
+    np.testing.assert_array_equal(raster, expected)
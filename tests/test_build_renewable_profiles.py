@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import atlite
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import xarray as xr
+from build_renewable_profiles import compute_availabilitymatrix, generation_cache_file
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+
+@pytest.fixture
+def cutout(tmp_path):
+    ds = xr.Dataset(
+        coords=dict(
+            x=np.arange(20, 22.01, 0.25),
+            y=np.arange(-30, -28.49, 0.25),
+            time=pd.date_range("2012-01-01", periods=3, freq="H"),
+        )
+    )
+    ds = ds.assign_coords(lon=ds.x, lat=ds.y)
+    ds.attrs.update(module="era5", dx=0.25, dy=0.25)
+    return atlite.Cutout(tmp_path / "cutout.nc", data=ds)
+
+
+@pytest.fixture
+def excluder(tmp_path):
+    # excluded land only in the north east, so that an upside down matrix differs
+    raster = np.zeros((480, 480), dtype="uint8")
+    raster[:180, 300:] = 1
+    fn = tmp_path / "exclusion.tif"
+    with rasterio.open(
+        fn, "w", driver="GTiff", height=480, width=480, count=1, dtype="uint8",
+        crs="EPSG:4326", transform=from_origin(19.9, -28.4, 0.005, 0.005),
+    ) as dst:
+        dst.write(raster, 1)
+
+    excluder = atlite.ExclusionContainer(crs=3035, res=500)
+    excluder.add_raster(str(fn), codes=[1], crs=4326)
+    return excluder
+
+
+@pytest.fixture
+def regions():
+    return gpd.GeoDataFrame(
+        geometry=[box(20.1, -29.9, 21.2, -28.6), box(21.2, -29.4, 21.9, -28.7)],
+        index=pd.Index(["bus 1", "bus 2"], name="name"),
+        crs=4326,
+    )
+
+
+def test_availabilitymatrix_matches_atlite(cutout, regions, excluder):
+    expected = cutout.availabilitymatrix(regions, excluder)
+    matrix = compute_availabilitymatrix(cutout, regions, excluder)
+
+    assert matrix.dims == expected.dims
+    np.testing.assert_allclose(matrix.values, expected.values, atol=1e-8)
+
+
+def test_tiled_availabilitymatrix_adds_up(cutout, regions, excluder):
+    expected = cutout.availabilitymatrix(regions, excluder)
+    matrix = compute_availabilitymatrix(cutout, regions, excluder, tile_size=30000)
+
+    # exclusion raster pixels are masked by their centre, tile edges shift by up to a pixel
+    np.testing.assert_allclose(matrix.values, expected.values, atol=0.02)
+
+
+def test_generation_cache_file_key(cutout, tmp_path):
+    cutout.data.to_netcdf(tmp_path / "saved.nc")
+    cutout = atlite.Cutout(tmp_path / "saved.nc")
+    correction = tmp_path / "wind_correction.nc"
+    correction.write_bytes(b"v1")
+    solar = dict(method="pv", panel="CSi", orientation="latitude_optimal")
+    wind = dict(method="wind", turbine="Vestas_V112_3MW")
+
+    def key(resource, **kwargs):
+        return generation_cache_file(tmp_path, cutout, "tech", resource, **kwargs)
+
+    # the wind correction only enters the key of wind conversions
+    assert key(solar, wind_correction=correction) == key(solar)
+    assert key(wind, wind_correction=correction) != key(wind)
+    wind_key = key(wind, wind_correction=correction)
+    correction.write_bytes(b"v2")
+    assert key(wind, wind_correction=correction) != wind_key
+
+    solar_key = key(solar)
+    cutout.data.attrs["module"] = "sarah"
+    assert key(solar) != solar_key
@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import pandas as pd
+from build_summary_catalog import build_catalog
+
+
+def test_build_catalog(tmp_path):
+    summary = pd.DataFrame(
+        dict(quantity=["objective", "energy"], carrier=[None, "solar"],
+             period=pd.array([pd.NA, 2030], dtype="Int64"), unit=["currency", "MWh"],
+             value=[100.0, 12.0])
+    )
+    fns = []
+    for opts in ["Co2L", "LC"]:
+        fn = tmp_path / f"solved_{opts}.parquet"
+        summary.assign(opts=opts, ll="copt").to_parquet(fn, index=False)
+        fns.append(fn)
+
+    catalog = build_catalog(fns)
+
+    assert len(catalog) == 4
+    assert list(catalog.columns) == list(summary.columns) + ["opts", "ll"]
+    assert catalog.groupby("opts").value.sum().to_dict() == {"Co2L": 112.0, "LC": 112.0}
+    assert catalog.period.dtype == "Int64"
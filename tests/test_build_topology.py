@@ -0,0 +1,34 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+from build_topology import zonal_sum
+from rasterio.transform import from_origin
+from rasterstats import zonal_stats
+from shapely.geometry import Point, box
+
+
+def test_zonal_sum_matches_rasterstats(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 100, (200, 300)).astype("float32")
+    values[50:60, :] = -1  # nodata
+    fn = tmp_path / "population.tif"
+    with rasterio.open(
+        fn, "w", driver="GTiff", height=200, width=300, count=1, dtype="float32",
+        crs="EPSG:4326", transform=from_origin(20, -25, 0.01, 0.01), nodata=-1,
+    ) as dst:
+        dst.write(values, 1)
+
+    shapes = gpd.GeoSeries(
+        [box(20.2, -26.5, 21.1, -25.3), Point(22.2, -26).buffer(0.6), box(21.15, -26.9, 21.5, -25.1)],
+        index=pd.Index(["a", "b", "c"], name="name"),
+        crs=4326,
+    )
+    expected = [s["sum"] for s in zonal_stats(shapes, str(fn), stats="sum")]
+
+    # windows smaller than the shapes, which then span several of them
+    np.testing.assert_allclose(zonal_sum(shapes, fn, window_size=64), expected, rtol=1e-6)
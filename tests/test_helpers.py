@@ -0,0 +1,203 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import numpy as np
+import pandas as pd
+import pypsa
+import pytest
+from pypsa.descriptors import get_switchable_as_dense
+
+from _helpers import (
+    append_period_zarr,
+    append_results_zarr,
+    export_network,
+    export_network_zarr,
+    load_network_lazy,
+    summarise_network,
+)
+
+PROFILE = dict(
+    compression="zlib", complevel=4, chunk_periods=True, float32_inputs=True, drop_static=True
+)
+
+
+def multi_period_network(periods=(2025, 2030, 2035)):
+    n = pypsa.Network()
+    snapshots = pd.date_range("2030-01-01", periods=2, freq="H")
+    n.set_snapshots(snapshots)
+    n.snapshots = pd.MultiIndex.from_product([list(periods), snapshots])
+    n.set_investment_periods(list(periods))
+    n.investment_period_weightings["years"] = [5 if p < 2035 else 10 for p in periods]
+    # values only depend on the period, so that networks of a part of the periods match
+    index = np.array([[p - 2025 + i for i in range(2)] for p in periods]).ravel()
+
+    n.add("Bus", "bus")
+    n.add("Load", "load", bus="bus", p_set=pd.Series(index, n.snapshots, dtype=float))
+    n.add(
+        "Generator", "solar", bus="bus", p_nom=10,
+        p_max_pu=pd.Series(0.1 + index / 20, n.snapshots),
+    )
+    # equal to the static value, which is also pypsa's default and not exported
+    n.add("Generator", "wind", bus="bus", p_nom=10, p_max_pu=pd.Series(1.0, n.snapshots))
+    # equal to the static value, dropped by the export profile
+    n.add("Generator", "hydro", bus="bus", p_nom=5, p_max_pu=0.5)
+    n.generators_t.p_max_pu["hydro"] = 0.5
+    n.add("StorageUnit", "battery", bus="bus", p_nom=1)
+    for y in n.investment_periods:
+        n.add("GlobalConstraint", f"co2_{y}", investment_period=y, constant=1)
+    n.add("GlobalConstraint", "co2", constant=1)
+    return n
+
+
+def assert_same_network(n, expected, skip=()):
+    assert n.snapshots.equals(expected.snapshots)
+    pd.testing.assert_frame_equal(
+        n.investment_period_weightings, expected.investment_period_weightings,
+        check_names=False,
+    )
+    for c in expected.iterate_components(expected.all_components - set(skip)):
+        pd.testing.assert_frame_equal(
+            n.df(c.name)[c.df.columns], c.df, check_names=False, check_dtype=False
+        )
+        varying = c.attrs.index[c.attrs.varying & c.attrs.status.str.startswith("Input")]
+        for attr in varying.intersection(c.df.columns):
+            pd.testing.assert_frame_equal(
+                get_switchable_as_dense(n, c.name, attr),
+                get_switchable_as_dense(expected, c.name, attr),
+                check_names=False, check_dtype=False, rtol=1e-6,
+            )
+
+
+@pytest.fixture
+def network_fn(tmp_path):
+    n = multi_period_network()
+    fn = tmp_path / "network.nc"
+    n.export_to_netcdf(fn)
+    return fn
+
+
+def test_load_network_lazy_selects_periods(network_fn):
+    full = pypsa.Network(str(network_fn))
+    n = load_network_lazy(network_fn, periods=[2030])
+
+    pd.testing.assert_index_equal(n.investment_periods, full.investment_periods)
+    pd.testing.assert_frame_equal(
+        n.investment_period_weightings, full.investment_period_weightings
+    )
+    assert n.snapshots.equals(full.snapshots[full.snapshots.get_level_values(0) == 2030])
+    pd.testing.assert_frame_equal(
+        n.generators_t.p_max_pu, full.generators_t.p_max_pu.loc[n.snapshots]
+    )
+    assert set(n.global_constraints.index) == {"co2_2030", "co2"}
+
+
+def test_load_network_lazy_selects_components_and_attrs(network_fn):
+    n = load_network_lazy(network_fn, components=["Generator"], attrs=["p_max_pu"])
+
+    assert n.loads.empty and n.storage_units.empty
+    assert list(n.generators.index) == ["solar", "wind", "hydro"]
+    assert list(n.generators_t.p_max_pu.columns) == ["solar", "hydro"]
+    assert n.loads_t.p_set.empty
+
+
+def test_export_network_round_trip(tmp_path):
+    expected = multi_period_network()
+    fn = tmp_path / "network.nc"
+    export_network(expected, fn, PROFILE)
+
+    n = pypsa.Network(str(fn))
+    assert "hydro" not in n.generators_t.p_max_pu
+    assert_same_network(n, expected)
+
+
+def test_export_network_zarr_round_trip(tmp_path):
+    expected = multi_period_network()
+    path = tmp_path / "network.zarr"
+    export_network(expected, path, PROFILE)
+
+    assert_same_network(load_network_lazy(path), expected)
+
+
+def test_append_results_zarr(tmp_path):
+    n = multi_period_network()
+    path = tmp_path / "network.zarr"
+    export_network_zarr(n, path, PROFILE)
+
+    n.generators_t.p = n.get_switchable_as_dense("Generator", "p_max_pu") * n.generators.p_nom
+    n.generators["p_nom_opt"] = n.generators.p_nom
+    n.objective = 42.0
+    append_results_zarr(n, path)
+
+    m = load_network_lazy(path)
+    assert_same_network(m, n)
+    pd.testing.assert_frame_equal(
+        m.generators_t.p, n.generators_t.p, check_names=False, check_freq=False
+    )
+    assert m.objective == 42.0
+
+
+def test_append_period_zarr(tmp_path):
+    path = tmp_path / "network.zarr"
+    export_network_zarr(multi_period_network([2025]), path, PROFILE)
+
+    expected = multi_period_network()
+    for period in [2030, 2035]:
+        append_period_zarr(expected, path, period, PROFILE)
+
+    # the global constraints of the appended periods are not added
+    n = load_network_lazy(path)
+    assert_same_network(n, expected, skip=["GlobalConstraint"])
+    assert set(n.global_constraints.index) == {"co2_2025", "co2"}
+
+    with pytest.raises(ValueError):
+        n = multi_period_network()
+        n.add("Load", "other", bus="bus", p_set=pd.Series(1.0, n.snapshots))
+        append_period_zarr(n, path, 2035, PROFILE)
+
+
+def solved_network():
+    n = pypsa.Network()
+    n.set_snapshots(pd.date_range("2030-01-01", periods=2, freq="H"))
+    n.add("Carrier", "coal", co2_emissions=1.0)
+    n.add("Bus", "bus")
+    n.add("Load", "load", bus="bus", p_set=[10.0, 20.0])
+    n.add("Generator", "solar", bus="bus", carrier="solar", p_nom=10, p_max_pu=[0.5, 1.0])
+    # planned outages make the availability of conventional plants time-varying too
+    n.add("Generator", "coal", bus="bus", carrier="coal", p_nom=20, efficiency=0.5,
+          p_max_pu=[0.9, 0.8])
+    n.add("Generator", "load_shedding", bus="bus", carrier="load_shedding", p_nom=1e6)
+
+    n.generators["p_nom_opt"] = n.generators.p_nom
+    n.generators_t.p = pd.DataFrame(
+        {"solar": [4.0, 8.0], "coal": [6.0, 12.0], "load_shedding": [0.0, 0.0]}, n.snapshots
+    )
+    n.loads_t.p = n.loads_t.p_set.copy()
+    n.buses_t.marginal_price = pd.DataFrame({"bus": [10.0, 40.0]}, n.snapshots)
+    n.objective = 100.0
+    return n
+
+
+def test_summarise_network():
+    summary = summarise_network(
+        solved_network(), dict(co2=2.0), renewable_carriers=["onwind", "solar"]
+    )
+    value = summary.set_index(["quantity", "carrier"]).value
+
+    assert summary.period.dropna().unique().tolist() == [2030]
+    assert value["objective"].item() == 100.0
+    assert value["capacity", "coal"] == 20 and value["capacity", "load_shedding"] == 1e6
+    assert value["energy", "solar"] == 12 and value["energy", "coal"] == 18
+    assert value["emissions", "coal"] == 36 and value["emission_tax", "coal"] == 72
+    assert value["load_weighted_price"].item() == 30
+    # only the variable renewables are curtailed
+    assert value["curtailment"].to_dict() == {"solar": 3.0}
+
+
+def test_summarise_network_curtails_varying_availability():
+    n = solved_network()
+    n.generators_t.p_max_pu.drop(columns="coal", inplace=True)
+    summary = summarise_network(n)
+
+    curtailment = summary.query("quantity == 'curtailment'")
+    assert curtailment.set_index("carrier").value.to_dict() == {"solar": 3.0}
@@ -0,0 +1,521 @@
+# SPDX-FileCopyrightText: : 2023 Meridian Economics
+#
+# SPDX-License-Identifier: MIT
+
+import io
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pypsa
+import pytest
+import solve_network
+from conftest import requires_cbc
+from pypsa.descriptors import get_activity_mask
+from pypsa.linopf import define_constraints, get_var, join_exprs, linexpr, prepare_lopf
+
+PERIODS = [2025, 2030, 2035]
+
+
+@pytest.fixture
+def config():
+    return {
+        "solving": {
+            "solver": {"name": "cbc"},
+            "options": {"foresight": "myopic", "skip_iterations": True},
+        },
+        "electricity": {},
+        "costs": {"emission_prices": {"co2": 0.0}},
+    }
+
+
+@pytest.fixture
+def network():
+    n = pypsa.Network()
+    snapshots = pd.MultiIndex.from_product(
+        [PERIODS, pd.date_range("2025-01-01", periods=3, freq="H")]
+    )
+    n.set_snapshots(snapshots)
+    n.set_investment_periods(PERIODS)
+    n.add("Carrier", "gas", co2_emissions=0.5)
+    n.add("Carrier", "solar")
+    n.add("Bus", "bus")
+    n.add("Load", "load", bus="bus", p_set=pd.Series([80.0, 100.0, 90.0] * 3, snapshots))
+    n.add(
+        "Generator", "gas", bus="bus", carrier="gas", p_nom=100.0,
+        marginal_cost=50.0, build_year=2020, lifetime=100,
+    )
+    for period in PERIODS:
+        n.add(
+            "Generator", f"solar {period}", bus="bus", carrier="solar",
+            p_nom_extendable=True, capital_cost=1000.0, build_year=period, lifetime=30,
+            p_max_pu=pd.Series([0.0, 0.5, 1.0] * 3, snapshots),
+        )
+    return n
+
+
+@pytest.fixture
+def solve_env(monkeypatch, config, tmp_path):
+    monkeypatch.setattr(
+        solve_network,
+        "snakemake",
+        SimpleNamespace(config=config, wildcards=SimpleNamespace(regions="RSA")),
+        raising=False,
+    )
+    # the model specific constraints need the model_file workbook
+    monkeypatch.setattr(solve_network, "extra_functionality", lambda n, sns: None)
+    return dict(solver_dir=str(tmp_path))
+
+
+@requires_cbc
+def test_myopic_solves_every_period(network, config, solve_env):
+    n = solve_network.solve_network_myopic(network, config, opts=[], **solve_env)
+
+    # capacities of all periods are fixed after their period was solved
+    solar = n.generators.query("carrier == 'solar'")
+    assert not solar.p_nom_extendable.any()
+    assert (solar.p_nom >= 0).all()
+
+    # every snapshot is dispatched and the load is met in every period
+    supply = n.generators_t.p.reindex(n.snapshots).sum(axis=1)
+    np.testing.assert_allclose(supply.values, n.loads_t.p_set["load"].values, atol=1e-6)
+    assert not n.generators_t.p.isna().any().any()
+
+
+@requires_cbc
+def test_myopic_co2_limit_only_in_its_period(network, config, solve_env, monkeypatch):
+    added = {}
+    solve = solve_network.solve_network
+
+    def record(m, *args, **kwargs):
+        m, *rest = solve(m, *args, **kwargs)
+        added[m.investment_periods[0]] = "CO2Limit2030" in m.global_constraints.index
+        return (m, *rest)
+
+    monkeypatch.setattr(solve_network, "solve_network", record)
+    solve_network.solve_network_myopic(network, config, opts=[], **solve_env)
+
+    assert added == {2025: False, 2030: True, 2035: False}
+
+
+@requires_cbc
+@pytest.mark.parametrize("skip_iterations", [True, False])
+def test_myopic_warmstart_from_previous_period(network, config, solve_env, monkeypatch, skip_iterations):
+    import pypsa.linopf
+
+    config["solving"]["options"].update(
+        warmstart=True, skip_iterations=skip_iterations, min_iterations=1, max_iterations=1
+    )
+    solve_network.snakemake.wildcards.regions = "27-supply"
+    warmstarts = []
+    solve = pypsa.linopf.run_and_read_cbc
+
+    def record(n, problem_fn, solution_fn, solver_logfile, solver_options, warmstart=None, store_basis=True):
+        warmstarts.append(warmstart)
+        return solve(n, problem_fn, solution_fn, solver_logfile, solver_options, warmstart, store_basis)
+
+    monkeypatch.setattr(pypsa.linopf, "run_and_read_cbc", record)
+    solve_network.solve_network_myopic(network, config, opts=[], **solve_env)
+
+    # the first period starts cold, every following one from a stored basis
+    solves = len(warmstarts) // len(PERIODS)
+    firsts = warmstarts[::solves]
+    assert not firsts[0]
+    assert all(isinstance(fn, str) and fn.endswith(".bas") for fn in firsts[1:])
+
+
+def single_period_network():
+    n = pypsa.Network()
+    n.set_snapshots(pd.date_range("2030-01-01", periods=4, freq="H"))
+    n.add("Carrier", "coal")
+    n.add("Carrier", "solar")
+    n.add("Bus", "bus")
+    n.add("Load", "load", bus="bus", p_set=[150.0, 250.0, 200.0, 100.0])
+    # three interchangeable units, one unit without capacity and one which never dispatches
+    n.madd("Generator", ["coal 1", "coal 2", "coal 3"], bus="bus", carrier="coal",
+           p_nom=[50.0, 100.0, 150.0], marginal_cost=20.0)
+    n.add("Generator", "coal 4", bus="bus", carrier="coal", p_nom=0.0, marginal_cost=20.0)
+    n.add("Generator", "solar old", bus="bus", carrier="solar", p_nom=100.0,
+          p_max_pu=pd.Series(0.0, n.snapshots))
+    n.add("Generator", "solar", bus="bus", carrier="solar", p_nom_extendable=True,
+          capital_cost=10.0, p_max_pu=pd.Series([0.0, 0.8, 1.0, 0.2], n.snapshots))
+    return n
+
+
+@requires_cbc
+def test_reduce_restore_generators_round_trip(config, tmp_path):
+    reference = single_period_network()
+    reference.lopf(pyomo=False, solver_name="cbc", solver_dir=str(tmp_path), keep_shadowprices=True)
+
+    n = single_period_network()
+    solve_network.reduce_generators(n, config)
+    assert len(n.generators) == 2
+    assert n.generators.at["coal 1", "p_nom"] == 300.0
+    n.lopf(pyomo=False, solver_name="cbc", solver_dir=str(tmp_path), keep_shadowprices=True)
+    solve_network.restore_generators(n)
+
+    assert not hasattr(n, "generator_reduction")
+    pd.testing.assert_index_equal(n.generators.index.sort_values(), reference.generators.index.sort_values())
+    np.testing.assert_allclose(n.objective, reference.objective)
+    pd.testing.assert_series_equal(
+        n.generators.p_nom_opt.sort_index(), reference.generators.p_nom_opt.sort_index()
+    )
+
+    p = n.generators_t.p
+    ref_p = reference.generators_t.p
+    by_carrier = n.generators.carrier
+    pd.testing.assert_frame_equal(
+        p.groupby(by_carrier, axis=1).sum(), ref_p.groupby(by_carrier, axis=1).sum(),
+        check_names=False,
+    )
+    # dispatch is split in proportion to the capacity of the original units
+    np.testing.assert_allclose(p["coal 2"], 2 * p["coal 1"])
+    assert (p[["coal 4", "solar old"]] == 0).all().all()
+
+    # shadow prices are restored for every generator
+    for k in ["mu_upper", "mu_lower"]:
+        mu = n.generators_t[k]
+        assert mu.columns.sort_values().equals(n.generators.index.sort_values())
+        np.testing.assert_allclose(mu["coal 2"], mu["coal 1"])
+        np.testing.assert_allclose(mu["coal 1"], reference.generators_t[k]["coal 1"], atol=1e-6)
+
+
+def transmission_network():
+    n = pypsa.Network()
+    n.set_snapshots(pd.date_range("2030-01-01", periods=3, freq="H"))
+    n.add("Carrier", "AC")
+    n.madd("Bus", ["north", "south"], carrier="AC", v_nom=400.0)
+    n.add("Line", "line", bus0="north", bus1="south", x=10.0, r=1.0, s_nom=50.0,
+          s_nom_extendable=True, capital_cost=100.0, length=100.0)
+    n.add("Generator", "cheap", bus="north", p_nom=500.0, marginal_cost=10.0)
+    n.add("Generator", "expensive", bus="south", p_nom=500.0, marginal_cost=100.0)
+    n.add("Load", "load", bus="south", p_set=[100.0, 200.0, 150.0])
+    n.add("GlobalConstraint", "lv_limit", type="transmission_volume_expansion_limit",
+          carrier_attribute="AC", sense="<=", constant=20000.0)
+    return n
+
+
+def typed_line_network():
+    n = pypsa.Network()
+    n.set_snapshots(pd.date_range("2030-01-01", periods=3, freq="H"))
+    n.add("Carrier", "AC")
+    n.add("Carrier", "gas", co2_emissions=0.5)
+    n.madd("Bus", ["north", "south", "east"], carrier="AC", v_nom=380.0)
+    # a meshed network of typed lines, where the flows depend on the impedances
+    n.madd("Line", ["north-south", "south-east", "north-east"],
+           bus0=["north", "south", "north"], bus1=["south", "east", "east"],
+           type="Al/St 240/40 4-bundle 380.0", length=[100.0, 150.0, 200.0],
+           s_nom=[1500.0, 800.0, 1200.0], s_nom_extendable=[True, True, False],
+           capital_cost=[100.0, 150.0, 200.0])
+    n.add("Generator", "cheap", bus="north", carrier="gas", p_nom=5000.0, marginal_cost=10.0)
+    n.add("Generator", "expensive", bus="east", carrier="gas", p_nom=5000.0, marginal_cost=100.0)
+    n.madd("Load", ["south", "east"], bus=["south", "east"],
+           p_set=pd.DataFrame({"south": [1000.0, 2500.0, 1800.0], "east": [800.0, 1500.0, 900.0]},
+                              n.snapshots))
+    return n
+
+
+@requires_cbc
+@pytest.mark.parametrize("checkpoint", [False, True])
+def test_scaling_does_not_change_the_solution(config, solve_env, tmp_path, checkpoint):
+    config["solving"]["options"].update(
+        foresight="perfect", skip_iterations=False, min_iterations=2, max_iterations=3
+    )
+    solve_network.snakemake.wildcards.regions = "27-supply"
+
+    def solve(scaling):
+        config["solving"]["options"]["scaling"] = dict(activate=scaling, power=1e-3, cost=1e-6)
+        cp = None
+        if checkpoint:
+            cp = solve_network.get_checkpoint(tmp_path / "checkpoints", f"scaling_{scaling}", "key")
+        n, *_ = solve_network.solve_network(
+            typed_line_network(), config, opts=[], checkpoint=cp, **solve_env
+        )
+        return n
+
+    reference, n = solve(False), solve(True)
+
+    assert not hasattr(n, "scaling")
+    np.testing.assert_allclose(n.objective, reference.objective, rtol=1e-5)
+    for attr in ["s_nom_opt", "num_parallel", "x", "r"]:
+        np.testing.assert_allclose(n.lines[attr], reference.lines[attr], rtol=1e-5)
+    np.testing.assert_allclose(n.lines_t.p0, reference.lines_t.p0, rtol=1e-5, atol=1e-3)
+
+
+@requires_cbc
+def test_ilopf_with_checkpoints_matches_ilopf(tmp_path):
+    kwargs = dict(solver_name="cbc", solver_dir=str(tmp_path), min_iterations=2,
+                  max_iterations=3, track_iterations=True)
+    reference = transmission_network()
+    solve_network.ilopf(reference, **kwargs)
+
+    n = transmission_network()
+    checkpoint = solve_network.get_checkpoint(tmp_path / "checkpoints", "test", "key")
+    solve_network.ilopf_with_checkpoints(n, checkpoint, **kwargs)
+
+    np.testing.assert_allclose(n.objective, reference.objective)
+    for i in range(1, reference.iteration + 1):
+        assert getattr(n, f"status_{i}") == getattr(reference, f"status_{i}")
+        np.testing.assert_allclose(getattr(n, f"objective_{i}"), getattr(reference, f"objective_{i}"))
+        np.testing.assert_allclose(
+            n.lines[f"s_nom_opt_{i}"], reference.lines[f"s_nom_opt_{i}"]
+        )
+        np.testing.assert_allclose(
+            n.global_constraints[f"mu_{i}"], reference.global_constraints[f"mu_{i}"]
+        )
+
+    # a restarted job continues after the last stored iteration
+    checkpoint = solve_network.get_checkpoint(tmp_path / "checkpoints", "test", "key")
+    assert checkpoint.state["iteration"] == reference.iteration
+    resumed = solve_network.load_checkpoint(checkpoint)
+    solve_network.ilopf_with_checkpoints(resumed, checkpoint, **kwargs)
+    np.testing.assert_allclose(resumed.objective, reference.objective)
+    assert resumed.iteration == reference.iteration
+
+
+def test_network_fingerprint_sensitivity(config, tmp_path, monkeypatch):
+    model_fn = tmp_path / "model_file.xlsx"
+    model_fn.write_bytes(b"reserves v1")
+    n = single_period_network()
+    fingerprint = solve_network.network_fingerprint(n, config, ["LC"], model_fn=model_fn)
+
+    assert solve_network.network_fingerprint(
+        single_period_network(), config, ["LC"], model_fn=model_fn
+    ) == fingerprint
+
+    costs = {**config, "costs": {"emission_prices": {"co2": 100.0}}}
+    assert solve_network.network_fingerprint(n, costs, ["LC"], model_fn=model_fn) != fingerprint
+
+    assert solve_network.network_fingerprint(n, config, ["LC", "CCL"], model_fn=model_fn) != fingerprint
+
+    assert solve_network.network_fingerprint(
+        n, config, ["LC"], model_fn=model_fn, model_file="other"
+    ) != fingerprint
+
+    model_fn.write_bytes(b"reserves v2")
+    assert solve_network.network_fingerprint(n, config, ["LC"], model_fn=model_fn) != fingerprint
+    model_fn.write_bytes(b"reserves v1")
+
+    m = single_period_network()
+    m.generators.loc["coal 3", "marginal_cost"] += 1.0
+    assert solve_network.network_fingerprint(m, config, ["LC"], model_fn=model_fn) != fingerprint
+
+    # helpers of the solving code are covered through the pypsa version and the module sources
+    monkeypatch.setattr(pypsa, "__version__", "0.0.0")
+    assert solve_network.network_fingerprint(n, config, ["LC"], model_fn=model_fn) != fingerprint
+    monkeypatch.undo()
+
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    for fn in ["solve_network.py", "_helpers.py"]:
+        (scripts / fn).write_bytes((Path(solve_network.__file__).parent / fn).read_bytes())
+    monkeypatch.setattr(solve_network.inspect, "getfile", lambda obj: str(scripts / "_helpers.py"))
+    assert solve_network.network_fingerprint(n, config, ["LC"], model_fn=model_fn) == fingerprint
+    with open(scripts / "_helpers.py", "a") as f:
+        f.write("\n# changed\n")
+    assert solve_network.network_fingerprint(n, config, ["LC"], model_fn=model_fn) != fingerprint
+
+
+def test_checkpoint_key_of_stored_network(config, tmp_path, monkeypatch):
+    import _helpers
+
+    fn = tmp_path / "network.nc"
+    model_fn = tmp_path / "model_file.xlsx"
+    model_fn.write_bytes(b"reserves v1")
+    monkeypatch.setattr(_helpers, "NETWORK_STORE", _helpers.NetworkStore([fn]))
+    _helpers.NETWORK_STORE[str(fn)] = single_period_network()
+
+    # the stored network is never written to disk
+    key = solve_network.get_checkpoint_key([fn, model_fn], config, ["LC"])
+    assert not fn.exists()
+    assert solve_network.get_checkpoint_key([fn, model_fn], config, ["LC"]) == key
+
+    _helpers.NETWORK_STORE[str(fn)].generators.loc["coal 3", "marginal_cost"] += 1.0
+    assert solve_network.get_checkpoint_key([fn, model_fn], config, ["LC"]) != key
+
+
+def test_enabled_constraints_follow_opts(config):
+    n = single_period_network()
+
+    def names(opts):
+        constraints = solve_network.enabled_constraints(n, n.snapshots, opts, config)
+        return [func.__name__ for func, _ in constraints]
+
+    assert "add_CCL_constraints" in names(["CCL"])
+    assert "add_CCL_constraints" not in names(["LC"])
+    assert names(["EQ0.7", "EQ0.5c"]).count("add_EQ_constraints") == 2
+
+
+# the dense formulations the sparse constraints replaced
+
+
+def dense_CCL_constraints(n, sns, config):
+    agg_p_nom_minmax = pd.read_csv(
+        config["electricity"]["agg_p_nom_limits"], index_col=list(range(2))
+    )
+    p_nom_per_cc = (
+        pd.DataFrame(
+            {
+                "p_nom": linexpr((1, get_var(n, "Generator", "p_nom"))),
+                "country": n.generators.bus.map(n.buses.country),
+                "carrier": n.generators.carrier,
+            }
+        )
+        .dropna(subset=["p_nom"])
+        .groupby(["country", "carrier"])
+        .p_nom.apply(join_exprs)
+    )
+    minimum = agg_p_nom_minmax["min"].dropna()
+    define_constraints(n, p_nom_per_cc[minimum.index], ">=", minimum, "agg_p_nom", "min")
+    maximum = agg_p_nom_minmax["max"].dropna()
+    define_constraints(n, p_nom_per_cc[maximum.index], "<=", maximum, "agg_p_nom", "max")
+
+
+def dense_EQ_constraints(n, sns, o, scaling=1e-1):
+    level = float(o[2:].rstrip("c"))
+    if o[-1] == "c":
+        ggrouper = n.generators.bus.map(n.buses.country)
+        lgrouper = n.loads.bus.map(n.buses.country)
+        sgrouper = n.storage_units.bus.map(n.buses.country)
+    else:
+        ggrouper = n.generators.bus
+        lgrouper = n.loads.bus
+        sgrouper = n.storage_units.bus
+    load = n.snapshot_weightings.generators @ n.loads_t.p_set.groupby(lgrouper, axis=1).sum()
+    inflow = n.snapshot_weightings.stores @ n.storage_units_t.inflow.groupby(sgrouper, axis=1).sum()
+    inflow = inflow.reindex(load.index).fillna(0.0)
+    rhs = scaling * (level * load - inflow)
+    lhs_gen = (
+        linexpr((n.snapshot_weightings.generators * scaling, get_var(n, "Generator", "p").T))
+        .T.groupby(ggrouper, axis=1)
+        .apply(join_exprs)
+    )
+    lhs_spill = (
+        linexpr((-n.snapshot_weightings.stores * scaling, get_var(n, "StorageUnit", "spill").T))
+        .T.groupby(sgrouper, axis=1)
+        .apply(join_exprs)
+    )
+    lhs_spill = lhs_spill.reindex(lhs_gen.index).fillna("")
+    define_constraints(n, lhs_gen + lhs_spill, ">=", rhs, "equity", "min")
+
+
+def dense_storage_global_constraints(n, sns):
+    glcs = n.global_constraints.query("type == 'tech_capacity_expansion_limit'")
+    c, attr = "StorageUnit", "p_nom"
+    for name, glc in glcs.iterrows():
+        car = glc["carrier_attribute"]
+        bus = str(glc.get("bus", ""))
+        ext_i = n.df(c).query("carrier == @car and p_nom_extendable").index
+        if bus:
+            ext_i = n.df(c).loc[ext_i].query("bus == @bus").index
+        ext_i = ext_i[get_activity_mask(n, c, sns)[ext_i].any()]
+        if ext_i.empty:
+            continue
+        lhs = join_exprs(linexpr((1, get_var(n, c, attr)[ext_i])))
+        define_constraints(
+            n, lhs, glc.sense, glc.constant, "GlobalConstraint", "mu",
+            axes=pd.Index([name]), spec=name,
+        )
+
+
+def constraint_network():
+    n = pypsa.Network()
+    n.set_snapshots(pd.date_range("2030-01-01", periods=3, freq="H"))
+    n.snapshot_weightings.loc[:, :] = 2.0
+    n.madd("Bus", ["a", "b", "c"], country=["ZA", "ZA", "BW"])
+    n.madd("Load", ["a", "b", "c"], bus=["a", "b", "c"], p_set=pd.DataFrame(
+        [[10.0, 20.0, 5.0], [15.0, 25.0, 5.0], [12.0, 18.0, 6.0]],
+        index=n.snapshots, columns=["a", "b", "c"],
+    ))
+    for bus in ["a", "b", "c"]:
+        n.add("Generator", f"{bus} coal", bus=bus, carrier="coal", p_nom=30.0, marginal_cost=20.0)
+        n.add("Generator", f"{bus} solar", bus=bus, carrier="solar", p_nom_extendable=True,
+              capital_cost=10.0, p_max_pu=pd.Series([0.1, 0.6, 0.9], n.snapshots))
+    n.add("Generator", "b wind", bus="b", carrier="onwind", p_nom_extendable=True, capital_cost=12.0)
+    n.madd("StorageUnit", ["a hydro", "c hydro"], bus=["a", "c"], carrier="hydro", p_nom=10.0,
+           max_hours=6.0, inflow=pd.DataFrame(3.0, n.snapshots, ["a hydro", "c hydro"]))
+    n.madd("StorageUnit", ["a battery", "b battery", "c battery"], bus=["a", "b", "c"],
+           carrier="battery", p_nom_extendable=True, capital_cost=5.0, max_hours=2.0)
+    n.madd("GlobalConstraint", ["battery a", "battery all", "battery c"],
+           type="tech_capacity_expansion_limit", carrier_attribute="battery",
+           bus=["a", "", "c"], sense=["<=", "<=", "=="], constant=[5.0, 12.0, 3.0])
+    return n
+
+
+def parse_constraints(lp):
+    constraints = []
+    for block in lp.strip().split("\n\n"):
+        lines = block.splitlines()
+        sense, rhs = lines[-1].split()
+        terms = {}
+        for line in lines[1:-1]:
+            coef, var = line.split()
+            terms[var] = terms.get(var, 0.0) + float(coef)
+        constraints.append((sense, float(rhs), tuple(sorted(terms.items()))))
+    return sorted(constraints)
+
+
+def written_constraints(n, func, tmp_path):
+    """Returns the constraints ``func`` writes to the linear problem of ``n``."""
+    written = {}
+
+    def extra_functionality(n, snapshots):
+        constraints_f = n.constraints_f
+        n.constraints_f = io.StringIO()
+        try:
+            func(n, snapshots)
+        finally:
+            written["lp"] = n.constraints_f.getvalue()
+            n.constraints_f = constraints_f
+
+    n._multi_invest = 0
+    prepare_lopf(n, n.snapshots, extra_functionality=extra_functionality, solver_dir=str(tmp_path))
+    return parse_constraints(written["lp"]), n
+
+
+def assert_same_constraints(sparse, dense):
+    assert len(sparse) == len(dense) > 0
+    for (s_sense, s_rhs, s_terms), (d_sense, d_rhs, d_terms) in zip(sparse, dense):
+        assert s_sense == d_sense
+        np.testing.assert_allclose(s_rhs, d_rhs)
+        assert [v for v, _ in s_terms] == [v for v, _ in d_terms]
+        np.testing.assert_allclose([c for _, c in s_terms], [c for _, c in d_terms])
+
+
+def test_CCL_constraints_match_dense(config, tmp_path):
+    limits = tmp_path / "agg_p_nom_minmax.csv"
+    limits.write_text("country,carrier,min,max\nZA,solar,10,100\nBW,solar,,20\nZA,onwind,5,\n")
+    config = {**config, "electricity": {"agg_p_nom_limits": str(limits)}}
+
+    sparse, _ = written_constraints(
+        constraint_network(), lambda n, sns: solve_network.add_CCL_constraints(n, sns, config), tmp_path
+    )
+    dense, _ = written_constraints(
+        constraint_network(), lambda n, sns: dense_CCL_constraints(n, sns, config), tmp_path
+    )
+    assert_same_constraints(sparse, dense)
+
+
+@pytest.mark.parametrize("o", ["EQ0.7", "EQ0.5c"])
+def test_EQ_constraints_match_dense(o, tmp_path):
+    sparse, _ = written_constraints(
+        constraint_network(), lambda n, sns: solve_network.add_EQ_constraints(n, sns, o), tmp_path
+    )
+    dense, _ = written_constraints(
+        constraint_network(), lambda n, sns: dense_EQ_constraints(n, sns, o), tmp_path
+    )
+    assert_same_constraints(sparse, dense)
+
+
+def test_storage_global_constraints_match_dense(tmp_path):
+    sparse, n = written_constraints(
+        constraint_network(), solve_network.define_storage_global_constraints, tmp_path
+    )
+    dense, _ = written_constraints(
+        constraint_network(), dense_storage_global_constraints, tmp_path
+    )
+    assert_same_constraints(sparse, dense)
+    assert "=" in [sense for sense, _, _ in sparse]
+    spec = n.constraints.loc[("GlobalConstraint", "mu"), "specification"]
+    assert spec.split(", ") == ["battery a", "battery all", "battery c"]